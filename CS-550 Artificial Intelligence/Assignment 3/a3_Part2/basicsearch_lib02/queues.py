@@ -1,108 +1,713 @@
-'''
-Queues: Stack, FIFOQueue, PriorityQueue
-'''
-
-import collections  # data containers
-import bisect   # efficient sorted lists
-
-
-
-
-
-class Queue:
-
-    """Queue is an abstract class/interface. There are three types:
-        Stack(): A Last In First Out Queue.
-        FIFOQueue(): A First In First Out Queue.
-        PriorityQueue(order, f): Queue in sorted order (default min-first).
-    Each type supports the following methods and functions:
-        q.append(item)  -- add an item to the queue
-        q.extend(items) -- equivalent to: for item in items: q.append(item)
-        q.pop()         -- return the top item from the queue
-        len(q)          -- number of items in q (also q.__len())
-        item in q       -- does q contain item?
-    Note that isinstance(Stack(), Queue) is false, because we implement stacks
-    as lists.  If Python ever gets interfaces, Queue will be an interface."""
-
-    def __init__(self):
-        raise NotImplementedError
-
-    def extend(self, items):
-        for item in items:
-            self.append(item)
-
-
-def Stack():
-    """Return an empty list, suitable as a Last-In-First-Out Queue."""
-    return []
-
-
-class FIFOQueue(Queue):
-
-    """A First-In-First-Out Queue."""
-
-    def __init__(self, maxlen=None, items=[]):
-        self.queue = collections.deque(items, maxlen)
-
-    def append(self, item):
-        if not self.queue.maxlen or len(self.queue) < self.queue.maxlen:
-            self.queue.append(item)
-        else:
-            raise Exception('FIFOQueue is full')
-
-    def extend(self, items):
-        if not self.queue.maxlen or len(self.queue) + len(items) <= self.queue.maxlen:
-            self.queue.extend(items)
-        else:
-            raise Exception('FIFOQueue max length exceeded')
-
-    def pop(self):
-        if len(self.queue) > 0:
-            return self.queue.popleft()
-        else:
-            raise Exception('FIFOQueue is empty')
-
-    def __len__(self):
-        return len(self.queue)
-
-    def __contains__(self, item):
-        return item in self.queue
-
-
-class PriorityQueue(Queue):
-
-    """A queue in which the minimum (or maximum) element (as determined by f and
-    order) is returned first. If order is min, the item with minimum f(x) is
-    returned first; if order is max, then it is the item with maximum f(x).
-    Also supports dict-like lookup."""
-
-    def __init__(self, order=min, f=lambda x: x):
-        self.A = []
-        self.order = order
-        self.f = f
-
-    def append(self, item):
-        bisect.insort(self.A, (self.f(item), item))
-
-    def __len__(self):
-        return len(self.A)
-
-    def pop(self):
-        if self.order == min:
-            return self.A.pop(0)[1]
-        else:
-            return self.A.pop()[1]
-
-    def __contains__(self, item):
-        return any(item == pair[1] for pair in self.A)
-
-    def __getitem__(self, key):
-        for _, item in self.A:
-            if item == key:
-                return item
-
-    def __delitem__(self, key):
-        for i, (value, item) in enumerate(self.A):
-            if item == key:
-                self.A.pop(i)
-
+'''
+Queues: Stack, FIFOQueue, IndexedFIFOQueue, PriorityQueue, HeapPriorityQueue,
+    IndexedPriorityQueue, BucketPriorityQueue, ExternalPriorityQueue
+'''
+
+import collections  # data containers
+import bisect   # efficient sorted lists
+import heapq    # binary heaps
+import itertools
+import mmap
+import os
+import pickle
+import random
+import struct
+import tempfile
+
+
+
+
+
+class Queue:
+
+    """Queue is an abstract class/interface. There are three types:
+        Stack(): A Last In First Out Queue.
+        FIFOQueue(): A First In First Out Queue.
+        IndexedFIFOQueue(): FIFOQueue with O(1) in, [] and del.
+        PriorityQueue(order, f): Queue in sorted order (default min-first).
+        HeapPriorityQueue(order, f): PriorityQueue on a binary heap.
+        IndexedPriorityQueue(order, f): heap with a hash index of its items.
+        BucketPriorityQueue(order, f, lifo): one bucket per integer f value.
+        ExternalPriorityQueue(order, f, budget): spills to disk past budget.
+    Each type supports the following methods and functions:
+        q.append(item)  -- add an item to the queue
+        q.extend(items) -- equivalent to: for item in items: q.append(item)
+        q.pop()         -- return the top item from the queue
+        len(q)          -- number of items in q (also q.__len())
+        item in q       -- does q contain item?
+    Priority queues can also be iterated (e.g. to save a search frontier),
+    giving their items in the order they would be popped.
+    Note that isinstance(Stack(), Queue) is false, because we implement stacks
+    as lists.  If Python ever gets interfaces, Queue will be an interface."""
+
+    def __init__(self):
+        raise NotImplementedError
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+
+def Stack():
+    """Return an empty list, suitable as a Last-In-First-Out Queue."""
+    return []
+
+
+class FIFOQueue(Queue):
+
+    """A First-In-First-Out Queue."""
+
+    def __init__(self, maxlen=None, items=[]):
+        self.queue = collections.deque(items, maxlen)
+
+    def append(self, item):
+        if not self.queue.maxlen or len(self.queue) < self.queue.maxlen:
+            self.queue.append(item)
+        else:
+            raise Exception('FIFOQueue is full')
+
+    def extend(self, items):
+        if not self.queue.maxlen or len(self.queue) + len(items) <= self.queue.maxlen:
+            self.queue.extend(items)
+        else:
+            raise Exception('FIFOQueue max length exceeded')
+
+    def pop(self):
+        if len(self.queue) > 0:
+            return self.queue.popleft()
+        else:
+            raise Exception('FIFOQueue is empty')
+
+    def __len__(self):
+        return len(self.queue)
+
+    def __contains__(self, item):
+        return item in self.queue
+
+
+class IndexedFIFOQueue(FIFOQueue):
+
+    """A First-In-First-Out Queue of hashable items with O(1) membership,
+    lookup and removal.  A dictionary from each item to its queued
+    entries is kept in step with append, extend and pop; del marks the
+    entries removed and pop skips them.  Duplicates are allowed, del
+    removes them all.  maxlen and the exceptions are those of FIFOQueue.
+
+    order and f may be given as keywords and are ignored, so that it
+    can be built as frontier(order=min, f=f) like the priority queues:
+    graph_search(problem, frontier=IndexedFIFOQueue) searches breadth
+    first whatever the problem's g and h."""
+
+    _REMOVED = object()  # placeholder for deleted items
+
+    def __init__(self, maxlen=None, items=[], *, order=min, f=None):
+        self.queue = collections.deque()  # entries [item]
+        self.index = {}  # item -> list of its entries in queue
+        self.maxlen = maxlen
+        self.size = 0
+        self.extend(items)
+
+    def append(self, item):
+        if self.maxlen and self.size >= self.maxlen:
+            raise Exception('FIFOQueue is full')
+        entry = [item]
+        self.queue.append(entry)
+        try:
+            self.index[item].append(entry)
+        except KeyError:
+            self.index[item] = [entry]
+        self.size += 1
+
+    def extend(self, items):
+        items = list(items)  # may be an iterator
+        if self.maxlen and self.size + len(items) > self.maxlen:
+            raise Exception('FIFOQueue max length exceeded')
+        for item in items:
+            self.append(item)
+
+    def pop(self):
+        while self.queue:
+            item = self.queue.popleft()[0]
+            if item is not self._REMOVED:
+                # Entries of an item leave in the order they arrived
+                entries = self.index[item]
+                if len(entries) == 1:
+                    del self.index[item]
+                else:
+                    entries.pop(0)
+                self.size -= 1
+                return item
+        raise Exception('FIFOQueue is empty')
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return (entry[0] for entry in self.queue
+                if entry[0] is not self._REMOVED)
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def __getitem__(self, key):
+        entries = self.index.get(key)
+        if entries:
+            return entries[0][0]
+
+    def __delitem__(self, key):
+        for entry in self.index.pop(key, ()):
+            entry[0] = self._REMOVED
+            self.size -= 1
+        if len(self.queue) > 2 * self.size + 64:
+            self.queue = collections.deque(
+                entry for entry in self.queue if entry[0] is not self._REMOVED)
+
+
+class PriorityQueue(Queue):
+
+    """A queue in which the minimum (or maximum) element (as determined by f and
+    order) is returned first. If order is min, the item with minimum f(x) is
+    returned first; if order is max, then it is the item with maximum f(x).
+    Also supports dict-like lookup."""
+
+    def __init__(self, order=min, f=lambda x: x):
+        self.A = []
+        self.order = order
+        self.f = f
+
+    def append(self, item):
+        bisect.insort(self.A, (self.f(item), item))
+
+    def __len__(self):
+        return len(self.A)
+
+    def __iter__(self):
+        items = [item for _, item in self.A]
+        return iter(items if self.order == min else reversed(items))
+
+    def pop(self):
+        if self.order == min:
+            return self.A.pop(0)[1]
+        else:
+            return self.A.pop()[1]
+
+    def __contains__(self, item):
+        return any(item == pair[1] for pair in self.A)
+
+    def __getitem__(self, key):
+        for _, item in self.A:
+            if item == key:
+                return item
+
+    def __delitem__(self, key):
+        for i, (value, item) in enumerate(self.A):
+            if item == key:
+                self.A.pop(i)
+
+
+# Tie breaking policies for HeapPriorityQueue, IndexedPriorityQueue and
+# ExternalPriorityQueue.  A policy is called as policy(item, count) with
+# the item's insertion count and returns a sortable value, among items
+# with equal f the smallest value is returned first.  The count is part
+# of every value so that items are never compared.  high_g and low_h
+# expect search Nodes.
+
+def fifo(item, count):
+    "fifo - equal f items in insertion order"
+    return count
+
+def lifo(item, count):
+    "lifo - most recently inserted equal f item first"
+    return -count
+
+def high_g(item, count):
+    """high_g - deepest equal f node first, then FIFO
+    Ranks by depth, the number of moves from the initial state: the
+    searchstrategies g functions give a per move value (e.g. 1, or
+    -depth for DepthFirst) rather than the path cost."""
+    return (-item.depth, count)
+
+def low_h(item, count):
+    "low_h - equal f node closest to the goal (smallest h) first, then FIFO"
+    return (item.get_h(), count)
+
+def seeded_random(seed=0):
+    "seeded_random(seed) - policy ordering equal f items randomly but reproducibly"
+    rng = random.Random(seed)
+    def policy(item, count):
+        return (rng.random(), count)
+    return policy
+
+def tiebreak_policy(name, seed=0):
+    "tiebreak_policy(name, seed) - policy by name, one of TIEBREAKS"
+    if name == "random":
+        return seeded_random(seed)
+    return {"fifo": fifo, "lifo": lifo, "high_g": high_g,
+            "low_h": low_h}[name]
+
+TIEBREAKS = ("fifo", "lifo", "high_g", "low_h", "random")
+
+
+class HeapPriorityQueue(Queue):
+
+    """A PriorityQueue kept as a binary heap, append and pop are O(log n).
+    Same interface and order as PriorityQueue: items with equal f(x) are
+    returned first-in-first-out for order min and last-in-first-out for
+    order max.  Ties are broken by an insertion counter, items are never
+    compared.  For order max, f must return numbers (they are negated).
+    tiebreak may be set to a tie breaking policy (e.g. high_g) to order
+    items with equal f instead.
+    Items must be hashable: a dictionary from each item to its queued
+    entries makes in, [] and del O(1).  Deleted items are marked and
+    skipped when they reach the top, the heap is rebuilt without them
+    once they outnumber the queued items."""
+
+    _REMOVED = object()  # placeholder for deleted items
+
+    def __init__(self, order=min, f=lambda x: x, tiebreak=None):
+        self.heap = []  # entries are [key, tiebreak, item]
+        self.index = {}  # item -> list of its entries in heap
+        self.order = order
+        self.f = f
+        self.tiebreak = tiebreak
+        self.counter = itertools.count()
+        self.size = 0
+
+    def _entry(self, item):
+        count = next(self.counter)
+        key = self.f(item) if self.order == min else -self.f(item)
+        if self.tiebreak is not None:
+            return [key, self.tiebreak(item, count), item]
+        return [key, count if self.order == min else -count, item]
+
+    def append(self, item):
+        entry = self._entry(item)
+        heapq.heappush(self.heap, entry)
+        try:
+            self.index[item].append(entry)
+        except KeyError:
+            self.index[item] = [entry]
+        self.size += 1
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        entries = sorted(self.heap, key=lambda entry: entry[:2])
+        return (entry[2] for entry in entries
+                if entry[2] is not self._REMOVED)
+
+    def pop(self):
+        while self.heap:
+            entry = heapq.heappop(self.heap)
+            item = entry[2]
+            if item is not self._REMOVED:
+                entries = self.index[item]
+                if len(entries) == 1:
+                    del self.index[item]
+                else:
+                    entries.remove(entry)
+                self.size -= 1
+                return item
+        raise IndexError('pop from empty HeapPriorityQueue')
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def __getitem__(self, key):
+        entries = self.index.get(key)
+        if entries:
+            return entries[0][2]
+
+    def __delitem__(self, key):
+        for entry in self.index.pop(key, ()):
+            entry[2] = self._REMOVED
+            self.size -= 1
+        if len(self.heap) > 2 * self.size + 64:
+            self.heap = [entry for entry in self.heap
+                         if entry[2] is not self._REMOVED]
+            heapq.heapify(self.heap)
+
+
+class IndexedPriorityQueue(Queue):
+
+    """A binary heap PriorityQueue with a dictionary from item to heap
+    position.  Items must be hashable (search Nodes hash by state).
+    Membership and lookup are O(1), removal and update O(log n), which
+    makes replacing a frontier node with a cheaper duplicate cheap.
+    Holds at most one item per key: appending an item equal to one
+    already queued replaces it (see update).  Ties in f are broken as
+    in PriorityQueue (FIFO for min, LIFO for max) or by the tiebreak
+    policy if one is given; for order max f must return numbers."""
+
+    def __init__(self, order=min, f=lambda x: x, tiebreak=None):
+        self.heap = []  # entries are [key, tiebreak, item]
+        self.index = {}  # item -> position in heap
+        self.order = order
+        self.f = f
+        self.tiebreak = tiebreak
+        self.counter = itertools.count()
+
+    # same entry layout and tie breaking as HeapPriorityQueue
+    _entry = HeapPriorityQueue._entry
+
+    # Entries are compared whole, as heapq does for HeapPriorityQueue:
+    # the tiebreak is unique, so comparisons never reach the item.  The
+    # sifts move a hole rather than swapping, each moved entry's index
+    # is written once.
+
+    def _siftup(self, pos):
+        "_siftup(pos) - move entry at pos toward the root, return new pos"
+        heap = self.heap
+        index = self.index
+        entry = heap[pos]
+        while pos > 0:
+            parent = (pos - 1) >> 1
+            above = heap[parent]
+            if entry < above:
+                heap[pos] = above
+                index[above[2]] = pos
+                pos = parent
+            else:
+                break
+        heap[pos] = entry
+        index[entry[2]] = pos
+        return pos
+
+    def _siftdown(self, pos):
+        "_siftdown(pos) - move entry at pos toward the leaves"
+        heap = self.heap
+        index = self.index
+        size = len(heap)
+        entry = heap[pos]
+        while True:
+            child = 2*pos + 1
+            if child >= size:
+                break
+            below = heap[child]
+            if child + 1 < size and heap[child+1] < below:
+                child += 1
+                below = heap[child]
+            if below < entry:
+                heap[pos] = below
+                index[below[2]] = pos
+                pos = child
+            else:
+                break
+        heap[pos] = entry
+        index[entry[2]] = pos
+
+    def append(self, item):
+        if item in self.index:
+            self.update(item)
+            return
+        self.heap.append(self._entry(item))
+        self._siftup(len(self.heap) - 1)
+
+    def update(self, item):
+        """update(item) - replace the queued item equal to item by item
+        and move it to its new place, e.g. decrease-key when a cheaper
+        path to a state is found.  It is ordered as if newly appended."""
+        pos = self.index.pop(item)
+        self.heap[pos] = self._entry(item)
+        self.index[item] = pos
+        self._siftdown(self._siftup(pos))
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __iter__(self):
+        entries = sorted(self.heap, key=lambda entry: entry[:2])
+        return (entry[2] for entry in entries)
+
+    def _remove(self, pos):
+        "_remove(pos) - remove and return the item at heap position pos"
+        heap = self.heap
+        item = heap[pos][2]
+        del self.index[item]
+        last = heap.pop()
+        if pos < len(heap):
+            heap[pos] = last
+            self._siftdown(self._siftup(pos))
+        return item
+
+    def pop(self):
+        if not self.heap:
+            raise IndexError('pop from empty IndexedPriorityQueue')
+        return self._remove(0)
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def __getitem__(self, key):
+        pos = self.index.get(key)
+        if pos is not None:
+            return self.heap[pos][2]
+
+    def __delitem__(self, key):
+        pos = self.index.get(key)
+        if pos is not None:
+            self._remove(pos)
+
+
+class BucketPriorityQueue(Queue):
+
+    """A priority queue for small integer priorities (e.g. N-puzzle f
+    values), one bucket per value of f(item).  append is O(1) and pop is
+    amortized O(1): a cursor walks from the best possibly non-empty
+    bucket toward the worst one and only moves back when an item with a
+    better priority arrives.  Items with equal f are returned in FIFO
+    order, or LIFO order when lifo is True.  Items must be hashable, a
+    dictionary of queued items makes in, [] and del O(1) (deleted items
+    are marked and skipped by pop).  Appending an item equal to one
+    already queued replaces it.  f must return integers."""
+
+    def __init__(self, order=min, f=lambda x: x, lifo=False):
+        self.buckets = {}  # f value -> deque of entries [item]
+        self.index = {}  # item -> entry
+        self.order = order
+        self.f = f
+        self.lifo = lifo
+        self.step = 1 if order == min else -1
+        self.cursor = None  # best key that may have items
+        self.size = 0
+
+    _REMOVED = object()  # placeholder for deleted items
+
+    def append(self, item):
+        value = self.f(item)
+        key = int(value)
+        if key != value:
+            raise ValueError('BucketPriorityQueue needs integer priorities, '
+                             'got {}'.format(value))
+        if item in self.index:
+            del self[item]
+        entry = [item]
+        try:
+            self.buckets[key].append(entry)
+        except KeyError:
+            self.buckets[key] = collections.deque([entry])
+        self.index[item] = entry
+        self.size += 1
+        # keys are compared as key*step so that min and max share code
+        if self.cursor is None or key*self.step < self.cursor*self.step:
+            self.cursor = key
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for key in sorted(self.buckets, key=lambda key: key*self.step):
+            bucket = self.buckets[key]
+            for entry in (reversed(bucket) if self.lifo else bucket):
+                if entry[0] is not self._REMOVED:
+                    yield entry[0]
+
+    def pop(self):
+        if self.size == 0:
+            raise IndexError('pop from empty BucketPriorityQueue')
+        while True:
+            bucket = self.buckets.get(self.cursor)
+            while bucket:
+                entry = bucket.pop() if self.lifo else bucket.popleft()
+                item = entry[0]
+                if item is not self._REMOVED:
+                    del self.index[item]
+                    self.size -= 1
+                    return item
+            # Bucket exhausted, move to the next priority
+            self.buckets.pop(self.cursor, None)
+            self.cursor += self.step
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def __getitem__(self, key):
+        entry = self.index.get(key)
+        if entry is not None:
+            return entry[0]
+
+    def __delitem__(self, key):
+        entry = self.index.pop(key, None)
+        if entry is not None:
+            entry[0] = self._REMOVED
+            self.size -= 1
+
+
+class _Run(object):
+    "_Run - a sorted run file of an ExternalPriorityQueue, read via mmap"
+
+    def __init__(self, path, count):
+        self.path = path
+        self.count = count  # records not yet read
+        # The mapping stays valid once the file is closed, one
+        # descriptor per run instead of two
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.offset = 0
+
+    def read(self, record):
+        "read(record) - next (key, tiebreak, payload), record is a Struct"
+        (key, tielength, length) = record.unpack_from(self.map, self.offset)
+        start = self.offset + record.size
+        tiebreak = pickle.loads(self.map[start:start+tielength])
+        start += tielength
+        self.offset = start + length
+        self.count -= 1
+        return (key, tiebreak, self.map[start:self.offset])
+
+    def close(self):
+        "close() - release and delete the run file"
+        self.map.close()
+        os.remove(self.path)
+
+
+class ExternalPriorityQueue(Queue):
+
+    """A priority queue that keeps at most budget items in memory.
+    The hot items live in an IndexedPriorityQueue.  When it grows past
+    budget, the worse half is sorted and written to a run file and the
+    better half stays in memory.  pop merges the hot heap with the heads
+    of all runs, which are read sequentially through memory maps, so a
+    long search slows to disk speed instead of exhausting memory.
+
+    Items are written with encode(item) -> bytes and read back with
+    decode(bytes) -> item, both required; for search nodes use
+    searchrep.NodeCodec, which stores the state's tiles rather than
+    the whole Node.  Items must be hashable and f must return numbers.
+    Order and ties are as in PriorityQueue, or as set by the tiebreak
+    policy.
+
+    in, [] and del only see the items in memory.  A duplicate of a
+    spilled item may be queued and is returned later, callers such as
+    graph_search skip states they have already explored.
+
+    Run files go in a temporary directory under directory (default the
+    system temporary directory).  Each run holds one file descriptor
+    (its memory map).  When there are more than max_runs runs, the
+    smaller half of them is merged into one run, which bounds open
+    files and the width of the merge.  Exhausted runs are deleted;
+    call close() to delete the rest."""
+
+    # run file record header: key, tiebreak length, payload length,
+    # followed by the pickled tiebreak and the payload
+    RECORD = struct.Struct("<dII")
+
+    # May return items equal to ones already returned (see above)
+    duplicates = True
+
+    def __init__(self, order=min, f=lambda x: x, budget=1000000,
+                 encode=None, decode=None, directory=None, tiebreak=None,
+                 max_runs=64):
+        if encode is None or decode is None:
+            raise ValueError("ExternalPriorityQueue needs encode and "
+                             "decode, e.g. searchrep.NodeCodec")
+        self.hot = IndexedPriorityQueue(order, f, tiebreak)
+        self.order = order
+        self.f = f
+        self.budget = max(budget, 2)
+        self.encode = encode
+        self.decode = decode
+        self.directory = directory
+        self.tempdir = None
+        self.heads = []  # heap of [key, tiebreak, run, payload]
+        self.spilled = 0  # items waiting in run files
+        self.nruns = 0  # run files created, names them
+        self.max_runs = max(max_runs, 2)
+
+    def append(self, item):
+        self.hot.append(item)
+        if len(self.hot) > self.budget:
+            self._spill()
+
+    def _spill(self):
+        "_spill() - move the worse half of the hot items to a run file"
+        # tiebreaks are unique, items themselves are never compared
+        entries = sorted(self.hot.heap, key=lambda entry: entry[:2])
+        keep = len(entries) // 2
+        # A sorted list is already a valid heap
+        self.hot.heap = entries[:keep]
+        self.hot.index = {entry[2]: pos
+                          for pos, entry in enumerate(self.hot.heap)}
+
+        if self.tempdir is None:
+            self.tempdir = tempfile.mkdtemp(prefix="frontier",
+                                            dir=self.directory)
+        self.spilled += len(entries) - keep
+        self._write([(key, tiebreak, self.encode(item))
+                     for (key, tiebreak, item) in entries[keep:]])
+        if len(self.heads) > self.max_runs:
+            self._merge()
+
+    def _write(self, records):
+        "_write(records) - new run of sorted (key, tiebreak, payload)"
+        path = os.path.join(self.tempdir, "run%06d" % (self.nruns))
+        self.nruns += 1
+        count = 0
+        with open(path, "wb") as f:
+            for (key, tiebreak, payload) in records:
+                tiebreak = pickle.dumps(tiebreak)
+                f.write(self.RECORD.pack(key, len(tiebreak), len(payload)))
+                f.write(tiebreak)
+                f.write(payload)
+                count += 1
+        self._advance(_Run(path, count))
+
+    def _merge(self):
+        "_merge() - merge the smaller half of the runs into one run"
+        # Every live run has exactly one entry in heads
+        heads = sorted(self.heads, key=lambda head: head[2].count)
+        merging = heads[:len(heads) // 2 + 1]
+        self.heads = heads[len(merging):]
+        heapq.heapify(self.heads)
+
+        def records(head):
+            (key, tiebreak, run, payload) = head
+            yield (key, tiebreak, payload)
+            while run.count:
+                yield run.read(self.RECORD)
+
+        self._write(heapq.merge(*[records(head) for head in merging],
+                                key=lambda record: record[:2]))
+        for head in merging:
+            head[2].close()
+
+    def _advance(self, run):
+        "_advance(run) - queue the next record of run, or retire the run"
+        if run.count:
+            (key, tiebreak, payload) = run.read(self.RECORD)
+            heapq.heappush(self.heads, [key, tiebreak, run, payload])
+        else:
+            run.close()
+
+    def __len__(self):
+        return len(self.hot) + self.spilled
+
+    def pop(self):
+        if self.heads and \
+                (not self.hot or self.heads[0][:2] < self.hot.heap[0][:2]):
+            (_, _, run, payload) = heapq.heappop(self.heads)
+            self.spilled -= 1
+            self._advance(run)
+            return self.decode(payload)
+        if not self.hot:
+            raise IndexError('pop from empty ExternalPriorityQueue')
+        return self.hot.pop()
+
+    def __contains__(self, item):
+        return item in self.hot
+
+    def __getitem__(self, key):
+        return self.hot[key]
+
+    def __delitem__(self, key):
+        del self.hot[key]
+
+    def close(self):
+        "close() - delete any remaining run files"
+        while self.heads:
+            heapq.heappop(self.heads)[2].close()
+        self.spilled = 0
+        if self.tempdir is not None:
+            os.rmdir(self.tempdir)
+            self.tempdir = None
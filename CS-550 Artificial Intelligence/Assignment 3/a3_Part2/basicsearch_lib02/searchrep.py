@@ -1,205 +1,321 @@
-'''
-searchrep - Classes and functions for representing search
-Created on Feb 8, 2018
-
-Based on Russell, S. J., and Norvig, P. (2010). Artificial intelligence : 
-    a modern approach (Prentice Hall, Upper Saddle River), pp. xviii, 1132 p.
-
-Contains contributions from multiple authors
-
-'''
-
-def print_nodes(nodes):
-    "print_nodes(nodes) - display a set of search nodes on the same line"
-    
-    if len(nodes) > 0:
-        nodereps = []  # string representation of each node
-        linecounts = []  # lines in string representation
-        widthstr = []  # format string for each node to align display
-
-        # Split representation into lines and add to list
-        for n in nodes:
-            # create a string representation of the search node
-            lines = str(n).split("\n")
-            # Make format string k characters wider than longest node line
-            # Produces format for fixed length string field, e.g. %12s
-            maxlinelen = max([len(l) for l in lines])
-            widthstr.append("%%%ds"%(maxlinelen+2))
-            linecounts.append(len(lines))  # track # lines needed for node
-            nodereps.append(lines)
-        
-        for lineidx in range(max(linecounts)):
-            for nodeidx in range(len(nodes)):
-                # Print out row of node representation and stay on same line
-                try:
-                    print(widthstr[nodeidx]%(nodereps[nodeidx][lineidx]), end='') 
-                except IndexError:
-                    # This node has fewer lines than the longest one
-                    print(widthstr[nodeidx]%" ", end='') 
-            print() # move to next line
-            
-
-
-class Problem(object):
-    """The abstract class for a formal problem.  You should subclass
-    this and implement the methods actions and result, and possibly
-    __init__, goal_test, and path_cost. Then you will create instances
-    of your subclass and solve them with the various search functions."""
-
-    def __init__(self, initial, goals=None, 
-                 g = lambda oldnode, action, newnode : oldnode.depth+1, 
-                 h = lambda newnode : 0):
-        """The constructor specifies the initial state, and one or
-        more goal states if they are countable states (override goal_test to
-        provide a suitable goal predicate if this is not the case).
-        
-        Callers should provide functions to estimate g (cost from initial
-        node to current node in search tree) as an argument of the 
-        of the new edge of the search tree being added:
-            oldnode, action that caused transition, newnode
-        and h, the heuristic value for the newnode.
-        
-        By default, breadth-first search behavior is provided.
-        
-        Your subclass's constructor can add other arguments.
-        """
-        
-        self.initial = initial  # store initial state
-        
-        # store goal(s) as a list (make it a list if it is not)
-        if goals != None:
-            self.goals = goals if isinstance(goals, list) else list(goals)
-        else:
-            self.goals = []
-        
-        # store function handles
-        self.g = g
-        self.h = h 
-
-    def actions(self, state):
-        """Return the actions that can be executed in the given
-        state. The result would typically be a list, but if there are
-        many actions, consider yielding them one at a time in an
-        iterator, rather than building them all at once."""
-        
-        return state.get_actions()
-
-    def result(self, state, action):
-        """Return the state that results from executing the given
-        action in the given state. The action must be one of
-        self.actions(state)."""
-        raise NotImplementedError
-
-    def goal_test(self, state):
-        """Return True if the state is a goal. The default method checks if
-        state is one of the constructor specified goals. Override this
-        method if checking against a list of goals is not sufficient."""
-        return state in self.goals
-
-    def value(self, state):
-        """For optimization problems, each state has a value.  Hill-climbing
-        and related algorithms try to maximize this value."""
-        raise NotImplementedError
-    
-    
-# -----------------------------------------------------------------------------
-
-class Node:
-    """A node in a search tree. Contains a pointer to the parent (the node
-    that this is a successor of) and to the actual state for this node. Note
-    that if a state is arrived at by two paths, then there are two nodes with
-    the same state.  Also includes the action that got us to this state, and
-    the total path_cost (also known as g) to reach the node.  Uses the problem's
-    implementation of the cost and heuristic functions to estimate the cost f of
-    arriving at the node f and the estimate to the goal node h.
-    
-    You will not need to subclass this class.
-    """
-
-    def __init__(self, problem, state, parent=None, action=None):
-        "Create a search tree Node, derived from a parent by an action."
-        self.problem = problem # Save problem representation
-        self.state = state
-        self.parent = parent
-        self.action = action
-        # find new node's depth and parent and cost from start
-        if parent:
-            self.depth = parent.depth + 1
-            if not action:
-                raise ValueError("New search nodes can only be derived " +
-                                 "via an action")
-            self.g = problem.g(parent, action, self)
-        else:
-            self.depth = 0  # root of search tree
-            self.g = 0  # cost of initial nodes
-            
-        self.h = problem.h(self.state)
-        self.f = self.g + self.h
-           
-    def expand(self, problem):
-        "List the nodes reachable in one step from this node."
-        return [self.child_node(action)
-                for action in problem.actions(self.state)]
-
-    def child_node(self, action):
-        """"child_node - Derive child node by applying an action to problem 
-        problem contains the current state representation
-        action indicates how the new state will be derived from the current
-        Similar to Fig. 3.10 of your text."""
-
-        # derive new state
-        nstate = self.problem.result(self.state, action)
-        # Create child
-        return Node(self.problem, nstate, parent=self, action=action)
-
-    def solution(self):
-        "Return the sequence of actions to go from the root to this node."
-        return [node.action for node in self.path()[1:]]
-
-    def path(self):
-        "Return a list of nodes forming the path from the root to this node."
-        node, path = self, []
-        # Chase parent pointers, appending each node as it is found
-        while node:
-            path.append(node)
-            node = node.parent
-        # List is from goal to initial state,
-        # reverse to provide initial state to goal
-        path.reverse()
-        return path
-    
-    def get_f(self):
-        "get_f estimate of cost from initial node to goal node"
-        return self.f
-    
-    def get_g(self):
-        "get_g estimate of cost form initial node to this node"
-        return self.g
-    
-    def get_h(self):
-        "get_h estimate of cost from this node to closest goal"
-        return self.h    
-    # We want for a queue of nodes in breadth_first_search or
-    # astar_search to have no duplicated states, so we treat nodes
-    # with the same state as equal. [Problem: this may not be what you
-    # want in other contexts.]
-
-    def __eq__(self, other):
-        return isinstance(other, Node) and self.state == other.state
-
-    def __lt__(self, node):
-        return self.f < node.f
-
-    def __hash__(self):
-        return hash(self.state)
-    
-    def __repr__(self):
-        return "f=%.1f (g=%.1f + h=%.1f)\n%s"%(
-                self.f, self.g, self.h, self.state)
-
-# -----------------------------------------------------------------------------
-
-
-
-
-
+'''
+searchrep - Classes and functions for representing search
+Created on Feb 8, 2018
+
+Based on Russell, S. J., and Norvig, P. (2010). Artificial intelligence : 
+    a modern approach (Prentice Hall, Upper Saddle River), pp. xviii, 1132 p.
+
+Contains contributions from multiple authors
+
+'''
+
+import struct
+import sys
+
+
+def format_nodes(nodes):
+    """format_nodes(nodes) - string showing a set of search nodes side by side
+    Each node's representation is right justified in a field two
+    characters wider than its longest line."""
+
+    nodereps = []  # lines of string representation of each node
+    widths = []  # field width for each node to align display
+
+    # Split representation into lines and add to list
+    for n in nodes:
+        # create a string representation of the search node
+        lines = str(n).split("\n")
+        # Make field k characters wider than longest node line
+        widths.append(max([len(l) for l in lines]) + 2)
+        nodereps.append(lines)
+
+    rows = []
+    for lineidx in range(max([len(lines) for lines in nodereps])):
+        # Nodes with fewer lines than the longest one are padded
+        rows.append("".join(
+            [(lines[lineidx] if lineidx < len(lines) else " ").rjust(width)
+             for lines, width in zip(nodereps, widths)]))
+    return "\n".join(rows) + "\n"
+
+
+def print_nodes(nodes, file=None):
+    """print_nodes(nodes) - display a set of search nodes on the same line
+    The whole display is written to file (default sys.stdout) at once."""
+    
+    if len(nodes) > 0:
+        (file or sys.stdout).write(format_nodes(nodes))
+
+
+def print_solution(path, file=None):
+    """print_solution(path) - display the moves and states along a path
+    path is a list of nodes from the initial state to the goal, e.g.
+    Node.path().  The display is built as a single string and written
+    to file (default sys.stdout) in one call, so long solutions do not
+    pay for thousands of print calls."""
+
+    parts = ["Solution in {} moves".format(len(path)-1),
+             "Initial state", str(path[0].state)]
+    for idx, node in enumerate(path[1:]):
+        parts.append("Move {} -  {}".format(idx+1, node.action))
+        parts.append(str(node.state))
+    parts.append("")  # trailing newline
+    (file or sys.stdout).write("\n".join(parts))
+            
+
+
+class Problem(object):
+    """The abstract class for a formal problem.  You should subclass
+    this and implement the methods actions and result, and possibly
+    __init__, goal_test, and path_cost. Then you will create instances
+    of your subclass and solve them with the various search functions."""
+
+    def __init__(self, initial, goals=None, 
+                 g = lambda oldnode, action, newnode : oldnode.depth+1, 
+                 h = lambda newnode : 0):
+        """The constructor specifies the initial state, and one or
+        more goal states if they are countable states (override goal_test to
+        provide a suitable goal predicate if this is not the case).
+        
+        Callers should provide functions to estimate g (cost from initial
+        node to current node in search tree) as an argument of the 
+        of the new edge of the search tree being added:
+            oldnode, action that caused transition, newnode
+        and h, the heuristic value for the newnode.
+        
+        By default, breadth-first search behavior is provided.
+        
+        Your subclass's constructor can add other arguments.
+        """
+        
+        self.initial = initial  # store initial state
+        
+        # store goal(s) as a list (make it a list if it is not)
+        if goals != None:
+            self.goals = goals if isinstance(goals, list) else list(goals)
+        else:
+            self.goals = []
+        
+        # store function handles
+        self.g = g
+        self.h = h 
+
+    def actions(self, state):
+        """Return the actions that can be executed in the given
+        state. The result would typically be a list, but if there are
+        many actions, consider yielding them one at a time in an
+        iterator, rather than building them all at once."""
+        
+        return state.get_actions()
+
+    def result(self, state, action):
+        """Return the state that results from executing the given
+        action in the given state. The action must be one of
+        self.actions(state)."""
+        raise NotImplementedError
+
+    def goal_test(self, state):
+        """Return True if the state is a goal. The default method checks if
+        state is one of the constructor specified goals. Override this
+        method if checking against a list of goals is not sufficient."""
+        return state in self.goals
+
+    def value(self, state):
+        """For optimization problems, each state has a value.  Hill-climbing
+        and related algorithms try to maximize this value."""
+        raise NotImplementedError
+    
+    
+# -----------------------------------------------------------------------------
+
+class Node:
+    """A node in a search tree. Contains a pointer to the parent (the node
+    that this is a successor of) and to the actual state for this node. Note
+    that if a state is arrived at by two paths, then there are two nodes with
+    the same state.  Also includes the action that got us to this state, and
+    the total path_cost (also known as g) to reach the node.  Uses the problem's
+    implementation of the cost and heuristic functions to estimate the cost f of
+    arriving at the node f and the estimate to the goal node h.
+    
+    You will not need to subclass this class.
+    """
+
+    def __init__(self, problem, state, parent=None, action=None, h=None):
+        """Create a search tree Node, derived from a parent by an action.
+        h may be given when the heuristic value was already computed
+        (e.g. for a batch of nodes), otherwise problem.h is called."""
+        self.problem = problem # Save problem representation
+        self.state = state
+        self.parent = parent
+        self.action = action
+        # find new node's depth and parent and cost from start
+        if parent:
+            self.depth = parent.depth + 1
+            if not action:
+                raise ValueError("New search nodes can only be derived " +
+                                 "via an action")
+            self.g = problem.g(parent, action, self)
+        else:
+            self.depth = 0  # root of search tree
+            self.g = 0  # cost of initial nodes
+            
+        self.h = problem.h(self.state) if h is None else h
+        self.f = self.g + self.h
+           
+    def expand(self, problem):
+        "List the nodes reachable in one step from this node."
+        return [self.child_node(action)
+                for action in problem.actions(self.state)]
+
+    def child_node(self, action):
+        """"child_node - Derive child node by applying an action to problem 
+        problem contains the current state representation
+        action indicates how the new state will be derived from the current
+        Similar to Fig. 3.10 of your text."""
+
+        # derive new state
+        nstate = self.problem.result(self.state, action)
+        # Create child
+        return Node(self.problem, nstate, parent=self, action=action)
+
+    def solution(self):
+        "Return the sequence of actions to go from the root to this node."
+        return [node.action for node in self.path()[1:]]
+
+    def path(self):
+        "Return a list of nodes forming the path from the root to this node."
+        node, path = self, []
+        # Chase parent pointers, appending each node as it is found
+        while node:
+            path.append(node)
+            node = node.parent
+        # List is from goal to initial state,
+        # reverse to provide initial state to goal
+        path.reverse()
+        moves = getattr(path[0], "moves", None)
+        if moves:
+            # Root was decoded by NodeCodec without its ancestors,
+            # rebuild them from its moves
+            path = replay(self.problem, moves, positions=True) + path[1:]
+        return path
+    
+    def get_f(self):
+        "get_f estimate of cost from initial node to goal node"
+        return self.f
+    
+    def get_g(self):
+        "get_g estimate of cost form initial node to this node"
+        return self.g
+    
+    def get_h(self):
+        "get_h estimate of cost from this node to closest goal"
+        return self.h    
+    # We want for a queue of nodes in breadth_first_search or
+    # astar_search to have no duplicated states, so we treat nodes
+    # with the same state as equal. [Problem: this may not be what you
+    # want in other contexts.]
+
+    def __eq__(self, other):
+        return isinstance(other, Node) and self.state == other.state
+
+    def __lt__(self, node):
+        return self.f < node.f
+
+    def __hash__(self):
+        return hash(self.state)
+    
+    def __repr__(self):
+        return "f=%.1f (g=%.1f + h=%.1f)\n%s"%(
+                self.f, self.g, self.h, self.state)
+
+# -----------------------------------------------------------------------------
+
+def replay(problem, actions, positions=False):
+    """replay(problem, actions, positions) - list of Nodes from
+    problem.initial along actions.  If positions is True, actions are
+    the positions of the actions in problem.actions(state) of each
+    parent, as stored by NodeCodec."""
+    node = Node(problem, problem.initial)
+    path = [node]
+    for action in actions:
+        if positions:
+            action = problem.actions(node.state)[action]
+        node = node.child_node(action)
+        path.append(node)
+    return path
+
+
+def tile_bytes(state):
+    """tile_bytes(state) - one byte per cell, 0 for the blank
+    The inverse of state.clone(tiles) for TileBoards."""
+    return bytes([tile or 0 for tile in state.state_tuple()])
+
+
+class NodeCodec(object):
+    """NodeCodec(problem) - Compact byte strings for search Nodes
+    A node is stored as its g, h and depth, its state's tiles (one byte
+    per cell, 0 for the blank) and its path from problem.initial: for
+    each move, the position of the action in problem.actions(state) of
+    the parent, one byte per move.  States must provide state_tuple and
+    clone(tiles) as TileBoard does.
+
+    decode rebuilds the state from its tiles without calling problem.h
+    or replaying the moves.  The decoded node has no parent, it keeps
+    its moves and path() (so solution()) replays them when asked.
+    Meant for spilling frontier nodes to disk, e.g.
+    queues.ExternalPriorityQueue(encode=codec.encode,
+    decode=codec.decode)."""
+
+    # g, h, depth, then the tiles and the moves
+    HEADER = struct.Struct("<ddI")
+
+    def __init__(self, problem):
+        self.problem = problem
+        self.cells = len(problem.initial.state_tuple())
+
+    def moves(self, node):
+        """moves(node) - bytes of action positions from problem.initial
+        The bytes of node's parent are kept on it as codecmoves, so its
+        other children, and nodes below it, start from them instead of
+        walking back to the root."""
+        parent = node.parent
+        if parent is None:
+            return bytes(getattr(node, "moves", b""))
+        prefix = getattr(parent, "codecmoves", None)
+        if prefix is None:
+            # Back to the nearest ancestor that knows its moves
+            steps = []
+            ancestor = parent
+            while ancestor.parent is not None and \
+                    getattr(ancestor, "codecmoves", None) is None:
+                steps.append(self.position(ancestor))
+                ancestor = ancestor.parent
+            prefix = getattr(ancestor, "codecmoves", None)
+            if prefix is None:
+                prefix = bytes(getattr(ancestor, "moves", b""))
+            steps.reverse()
+            prefix = prefix + bytes(steps)
+            parent.codecmoves = prefix
+        return prefix + bytes([self.position(node)])
+
+    def position(self, node):
+        "position(node) - index of node's action in its parent's actions"
+        return self.problem.actions(node.parent.state).index(node.action)
+
+    def encode(self, node):
+        "encode(node) - bytes describing node"
+        return b"".join((
+            self.HEADER.pack(node.g, node.h, node.depth),
+            tile_bytes(node.state),
+            self.moves(node)))
+
+    def decode(self, data):
+        "decode(data) - Node described by data"
+        (g, h, depth) = self.HEADER.unpack_from(data, 0)
+        start = self.HEADER.size
+        tiles = data[start:start+self.cells]
+        node = Node(self.problem, self.problem.initial.clone(tiles), h=h)
+        node.g = g
+        node.f = g + h
+        node.depth = depth
+        node.moves = bytes(data[start+self.cells:])
+        return node
@@ -1,234 +1,529 @@
-import random
-import copy
-import math
-
-from basicsearch_lib.board import Board
-
-
-class TileBoard(Board):
-    def __init__(self, n, multiple_solutions=False, force_state=None,
-                 verbose=False):
-        """"TileBoard(n, multiple_solutions, force_state)
-        Create a tile board for an n puzzle.
-        
-        If multipleSolutions is true, the solution need not
-        be in the bottom right.  This defaults to False but
-        is automatically set to True when there is no middle square 
-        
-        force_state can be used to initialize an n puzzle to a desired
-        configuration.  No error checking is done.  It is specified as
-        a list with n+1 elements in it, 1:n and None in the desired order.
-        """
-        
-        self.verbose = verbose
-        
-
-        self.boardsize = int(math.sqrt(n+1))  
-        if math.sqrt(n+1) != self.boardsize:
-            raise ValueError("Bad board size\n" +
-                "Must be one less than an odd perfect square 8, 24, ...")
-
-        # initialize parent
-        super().__init__(self.boardsize, self.boardsize)
-
-
-        # Compute solution states
-        if multiple_solutions:
-            # Create list of goals [(None, 1, 2, 3, ..), (1, None, 2, 3, ...),
-            #                        (1, 2, None, 3, ...), ...]
-            self.goals = []
-            for hole_position in range(n+1):
-                solution = []
-                # Add numbers 1 to n, placing a None at current hole_position
-                for idx in range(n+1):
-                    if idx < hole_position:
-                        solution.append(idx+1)
-                    elif idx == hole_position:
-                        solution.append(None)
-                    else:
-                        solution.append(idx)
-                self.goals.append(tuple(solution))
-
-        else:
-            # Single goal, hole in last position [(1, 2, 3, ..., None)]
-            self.goals = [tuple([None if idx == n else idx+1
-                                     for idx in range(n+1)])]
-
-        if force_state:
-            tiles = force_state
-            if not self.solvable(tiles):
-                raise ValueError("Puzzle is not solvable")
-        else:
-            # Build initial state - all in order
-            tiles = [val+1 for val in range(n)]
-            tiles.append(None)
-            # Verify problem is solvable
-            done = False
-            while not done:
-                random.shuffle(tiles)  # mix up tiles
-                done = self.solvable(tiles)
-
-        # populate the board with our tile order
-        for r in range(self.boardsize):
-            for c in range(self.boardsize):
-                tile = tiles[r*self.boardsize + c]  # next tile
-                if tile:                    
-                    self.place(r, c, tile)
-                else:
-                    # keep track of empty tile
-                    self.empty = (r, c)
-    
-    def solvable(self, tiles, verbose=False):
-        """solvable - Determines if a puzzle is solvable
-
-            Given a list of tiles, determine if the N-puzzle is solvable.
-            You do not need to know how to do this, but the calculation
-            is based on the inversion order.
-
-            for each number in the list of tiles,
-               How many following numbers are less than that one
-               e.g. [13, 10, 11, 6, 5, 7, 4, 8, 1, 12, 14, 9, 3, 15, 2, None]
-               Example:  Files following 9:  [3, 15, 2, None]
-               Two of these are smaller than 9, so the inversion order
-                   for 9 is 2
-
-            A puzzle's inversion order is the sum of the tile inversion
-            orders.  For puzzles with even numbers of rows and columns,
-            the row number on which the blank resides must be added.
-            Note that we need not worry about 1 as there are
-            no tiles smaller than one.
-
-            See Wolfram Mathworld for further explanation:
-                http://mathworld.wolfram.com/15Puzzle.html
-            and http://www.cut-the-knot.org/pythagoras/fifteen.shtml
-
-            This lets us know if a problem can be solved.  The inversion
-            order modulo 2 is invariant across moves.  This means that
-            when we make a legal move, the inversion order will always
-            be even or odd.  The solution state always has an even
-            inversion order, so any puzzle with an odd inversion
-            number cannot be solved.
-        """
-
-        inversionorder = 0
-        # Make life easy, remove None
-        reduced = [t for t in tiles if t is not None]
-        # Loop over all but last (no tile after it)
-        for idx in range(len(reduced)-1):
-            value = reduced[idx]
-            after = reduced[idx+1:]  # Remaining tiles
-            smaller = [x for x in after if x < value]
-            numtiles = len(smaller)
-            inversionorder = inversionorder + numtiles
-            if verbose:
-                print("idx {} value {} tail {} #smaller {} sum: {}".format(
-                    idx, value, after, numtiles, inversionorder))
-
-        # Account for blank when there are an even number of rows
-        if self.get_rows() % 2 == 0:
-            if verbose:
-                print("Even # rows, adding for position of blank")
-            inversionorder = inversionorder + \
-                math.floor(tiles.index(None) / self.boardsize)+1
-
-        solvable = inversionorder % 2 == 0  # Solvable if even
-        return solvable
-                                
-    def __hash__(self):
-        "__hash__ - Hash the board state"
-        
-        # Convert state to a tuple and hash
-        return hash(self.state_tuple())
-    
-    def __eq__(self, other):
-        "__eq__ - Check if objects equal:  a == b"
-
-        # Are states identical?
-        return self.state_tuple() == other.state_tuple()
-
-        # Set pairs to be equal to another
-        # equal = True  # until we found out otherwise
-        # # pair up board items in tuples and compare them
-        # for (mystate, otherstate) in zip(self.state_tuple(), other.state_tuple()):
-        #     equal = mystate == otherstate
-        #     if not equal:
-        #         break
-        # return equal
-    
-    def state_tuple(self):
-        "state_tuple - Return board state as a single tuple"
-        
-        # Iterate over the items in each list, merging them
-        flattened = [item for sublist in self.board
-                            for item in sublist]
-        # convert to tuple (hashable) and return 
-        return(tuple(flattened))
-    
-    def get_actions(self):
-        "Return row column offsets of where the empty tile can be moved"
-        
-        actions = []
-        # check row and column, no diagonal moves allowed
-        boarddims = [self.get_rows(), self.get_cols()]
-        for dim in [0, 1]:  # rows, then columns
-            # Append offsets to the actions list, 
-            # e.g. move left --> (-1,0)
-            #      move down --> (0, 1)
-            # Note that when we append to the list of actions,
-            # we use list( ) to make a copy of the list, otherwise
-            # we just get a pointer to it and modification of offset
-            # will change copies in the list.
-            offset = [0, 0]
-            # add if we don't go off the top or left
-            if self.empty[dim] - 1 >= 0:
-                offset[dim] = -1
-                actions.append(list(offset))
-            # append if we don't go off the bottom or right
-            if self.empty[dim] + 1 < boarddims[dim]:
-                offset[dim] = 1
-                actions.append(list(offset))
-                
-        return actions
-            
-    def move(self, offset):
-        """move - Move the empty space by [delta_row, delta_col] and 
-        return new TileBoard
-        """
-        
-        # Current row and column of empty space
-        (r, c) = self.empty
-        
-        [delta_r, delta_c] = offset
-        
-        # validate
-        rprime = r + delta_r
-        cprime = c + delta_c
-        if rprime < 0 or cprime < 0 or \
-            rprime >= self.get_rows() or cprime >= self.get_cols():
-            raise ValueError("Illegal move (%d,%d) from (%d,%d)"%(
-                    delta_r, delta_c, r, c))
-
-        # Make a copy of the board so that mutating it does not 
-        # modify other copies of the board.  Not the most efficient
-        # way to do this, but it will get the job done.
-        newboard = copy.deepcopy(self)
-        # Slide a tile into the empty slot position
-        newboard.place(r, c, self.get(rprime, cprime))
-        # update empty position
-        newboard.place(rprime, cprime, None)
-        newboard.empty = (rprime, cprime)
-        
-        return newboard
-        
-    #def __repr__(self):
-    #    """Alternate board representation - as state tuple
-    #       Useful for verifying that solutions do not have duplicate
-    #       states in path."""
-    #    return str(self.state_tuple())
-    
-    def solved(self):
-        "solved - Is the puzzle solved?"
-
-        # Check if state is in goals
-        solved = self.state_tuple() in self.goals
+import random
+import copy
+import math
+import functools
+import operator
+
+from basicsearch_lib02.board import Board
+
+
+def smaller_later(values):
+    """smaller_later(values) - count smaller values to the right of each
+    Yields (idx, count) from the last index to the first, count being
+    the number of values[j], j > idx, below values[idx].  values must
+    be distinct integers in 1..len(values).  Uses a Fenwick (binary
+    indexed) tree scanned from the right, O(n log n) with no slicing.
+    """
+    tree = [0] * (len(values) + 1)
+    for idx in range(len(values)-1, -1, -1):
+        value = values[idx]
+        if not 1 <= value <= len(values):
+            raise ValueError("Inversions need values in 1..{}, not {}".format(
+                len(values), value))
+        # Prefix sum: number of seen values < value
+        smaller = 0
+        pos = value - 1
+        while pos > 0:
+            smaller += tree[pos]
+            pos -= pos & -pos
+        yield (idx, smaller)
+        # Mark value as seen
+        pos = value
+        while pos < len(tree):
+            tree[pos] += 1
+            pos += pos & -pos
+
+
+def count_inversions(values, verbose=False):
+    """count_inversions(values) - Number of pairs i < j with values[i] > values[j]
+    values must be distinct integers in 1..len(values), see smaller_later.
+    """
+    inversions = 0
+    for (idx, smaller) in smaller_later(values):
+        inversions += smaller
+        if verbose:
+            print("idx {} value {} #smaller {} sum: {}".format(
+                idx, values[idx], smaller, inversions))
+    return inversions
+
+
+def cellbits(n):
+    "cellbits(n) - bits per cell of a packed n puzzle, blank is 0"
+    return max(4, n.bit_length())
+
+
+class GoalIndex(object):
+    """GoalIndex(n, multiple_solutions)
+    Goal states of an n puzzle, built once and shared by every TileBoard
+    with the same n and multiple_solutions (use GoalIndex.get).
+
+    goals - list of goal tuples, None for the blank
+    states - set of the goal tuples
+    packed - set of the goals packed as in TileBoard's packed mode
+    hashes - set of the goals' Zobrist hashes, a cheap pre-filter
+    positions - positions[g][tile] is the cell index of tile in goals[g]
+        (tile 0 is the blank)
+    """
+
+    _indices = {}
+
+    @classmethod
+    def get(cls, n, multiple_solutions=False):
+        "get(n, multiple_solutions) - shared index, built on first use"
+        key = (n, bool(multiple_solutions))
+        try:
+            return cls._indices[key]
+        except KeyError:
+            index = cls._indices[key] = cls(n, multiple_solutions)
+            return index
+
+    def __init__(self, n, multiple_solutions=False):
+        # Compute solution states
+        if multiple_solutions:
+            # Create list of goals [(None, 1, 2, 3, ..), (1, None, 2, 3, ...),
+            #                        (1, 2, None, 3, ...), ...]
+            self.goals = []
+            for hole_position in range(n+1):
+                solution = []
+                # Add numbers 1 to n, placing a None at current hole_position
+                for idx in range(n+1):
+                    if idx < hole_position:
+                        solution.append(idx+1)
+                    elif idx == hole_position:
+                        solution.append(None)
+                    else:
+                        solution.append(idx)
+                self.goals.append(tuple(solution))
+
+        else:
+            # Single goal, hole in last position [(1, 2, 3, ..., None)]
+            self.goals = [tuple([None if idx == n else idx+1
+                                     for idx in range(n+1)])]
+
+        self.states = frozenset(self.goals)
+        bits = cellbits(n)
+        zobrist = TileBoard.zobrist_table(int(math.sqrt(n+1)))
+        self.packed = frozenset(
+            sum((tile or 0) << (idx*bits) for idx, tile in enumerate(goal))
+            for goal in self.goals)
+        self.hashes = frozenset(
+            functools.reduce(operator.xor,
+                             [zobrist[tile or 0][idx]
+                              for idx, tile in enumerate(goal)])
+            for goal in self.goals)
+        self.positions = []
+        for goal in self.goals:
+            position = [0] * (n+1)
+            for idx, tile in enumerate(goal):
+                position[tile or 0] = idx
+            self.positions.append(position)
+
+    def __contains__(self, board):
+        "board in index - Is the TileBoard one of the goals?"
+        if board.zhash not in self.hashes:
+            return False
+        if board.packed:
+            return board.state in self.packed
+        return board.state_tuple() in self.states
+
+
+class TileBoard(Board):
+
+    # Zobrist key tables shared by all boards of a given size,
+    # see zobrist_table
+    _zobrist_tables = {}
+    # Legal moves for each blank position, see transition_table
+    _transition_tables = {}
+
+    def __init__(self, n, multiple_solutions=False, force_state=None,
+                 verbose=False, packed=False):
+        """"TileBoard(n, multiple_solutions, force_state, verbose, packed)
+        Create a tile board for an n puzzle.
+        
+        If multipleSolutions is true, the solution need not
+        be in the bottom right.  This defaults to False but
+        is automatically set to True when there is no middle square 
+        
+        force_state can be used to initialize an n puzzle to a desired
+        configuration.  No error checking is done.  It is specified as
+        a list with n+1 elements in it, 1:n and None in the desired order.
+
+        packed selects the compact state mode.  The tiles are packed into
+        a single integer, 4 bits per cell (more when n > 15) with the
+        blank stored as 0, and the index of the blank is cached.  In this
+        mode move, state_tuple, __hash__ and __eq__ work on the packed
+        value and new boards are made without deep copies.  get, place
+        and board remain available as a view of the packed value.
+
+        Every board carries a Zobrist hash (see zobrist_table) that is
+        updated incrementally as tiles are placed or moved.  lastmove is
+        (tile, from cell, to cell) for the tile slid by the last move or
+        slide, None for a new board, so heuristics can update the value
+        of the board before the move (see searchstrategies.LinearConflict).
+        """
+        
+        self.verbose = verbose
+        self.packed = packed
+        
+
+
+        self.boardsize = int(math.sqrt(n+1))  
+        if math.sqrt(n+1) != self.boardsize:
+            raise ValueError("Bad board size\n" +
+                "Must be one less than an odd perfect square 8, 24, ...")
+
+        # initialize parent
+        super().__init__(self.boardsize, self.boardsize)
+        if packed:
+            # Field width for one tile, blank is stored as 0
+            self.cellbits = cellbits(n)
+            self.cellmask = (1 << self.cellbits) - 1
+            self.state = 0
+            self._board = None  # no 2D list, see board property
+        # Zobrist hash of the empty board, place XORs in each tile
+        self.zobrist = self.zobrist_table(self.boardsize)
+        self.transitions = self.transition_table(self.boardsize)
+        self.zhash = 0
+        self.lastmove = None
+
+
+        # Solution states are shared by all boards of this kind
+        self.goalindex = GoalIndex.get(n, multiple_solutions)
+        self.goals = self.goalindex.goals
+
+        if force_state:
+            tiles = force_state
+            if not self.solvable(tiles):
+                raise ValueError("Puzzle is not solvable")
+        else:
+            # Build initial state - all in order
+            tiles = [val+1 for val in range(n)]
+            tiles.append(None)
+            # Verify problem is solvable
+            done = False
+            while not done:
+                random.shuffle(tiles)  # mix up tiles
+                done = self.solvable(tiles)
+
+        # populate the board with our tile order
+        for r in range(self.boardsize):
+            for c in range(self.boardsize):
+                tile = tiles[r*self.boardsize + c]  # next tile
+                if tile:                    
+                    self.place(r, c, tile)
+                else:
+                    # keep track of empty tile
+                    self.empty = (r, c)
+                    self.blank = r*self.boardsize + c
+
+    @property
+    def board(self):
+        """board - 2D list of tiles in row-major order
+        For packed boards this is a view rebuilt from the packed state,
+        modify the board with place rather than through the view."""
+        if self.packed:
+            tiles = self.state_tuple()
+            return [list(tiles[r*self.cols:(r+1)*self.cols])
+                    for r in range(self.rows)]
+        return self._board
+
+    @board.setter
+    def board(self, value):
+        self._board = value
+
+    @classmethod
+    def zobrist_table(cls, boardsize):
+        """zobrist_table(boardsize) - Zobrist keys for a board size
+        Returns a list indexed by [tile][cell] of random 64 bit keys,
+        built once per board size.  The blank (tile 0) has all zero keys
+        so that it never contributes to the hash.  The keys come from a
+        generator seeded with the board size, hashes are reproducible
+        and the global random state used for shuffling is not disturbed.
+        """
+        try:
+            return cls._zobrist_tables[boardsize]
+        except KeyError:
+            cells = boardsize * boardsize
+            rng = random.Random(boardsize)
+            table = [[0] * cells]  # blank
+            table.extend([rng.getrandbits(64) for _ in range(cells)]
+                         for _ in range(1, cells))
+            cls._zobrist_tables[boardsize] = table
+            return table
+
+    @classmethod
+    def transition_table(cls, boardsize):
+        """transition_table(boardsize) - Legal moves by blank position
+        Returns a list indexed by the blank's cell index (row*boardsize+col)
+        whose entries are (actions, targets):
+            actions - list of [delta_row, delta_col] offsets in the order
+                get_actions has always produced them (up, down, left, right)
+            targets - dict mapping (delta_row, delta_col) to the cell index
+                the blank moves to
+        Built once per board size and shared by all boards, so treat the
+        contents as read-only.  Search loops may iterate over
+        targets.items() directly to get every move and destination.
+        """
+        try:
+            return cls._transition_tables[boardsize]
+        except KeyError:
+            table = []
+            for blank in range(boardsize * boardsize):
+                (r, c) = divmod(blank, boardsize)
+                actions = []
+                targets = {}
+                # rows, then columns, no diagonal moves allowed
+                for (delta_r, delta_c) in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                    rprime = r + delta_r
+                    cprime = c + delta_c
+                    if 0 <= rprime < boardsize and 0 <= cprime < boardsize:
+                        actions.append([delta_r, delta_c])
+                        targets[(delta_r, delta_c)] = rprime*boardsize + cprime
+                table.append((actions, targets))
+            cls._transition_tables[boardsize] = table
+            return table
+
+    def place(self, row, col, item):
+        "place an item"
+        cell = row*self.cols + col
+        # XOR out the old tile and XOR in the new one
+        self.zhash ^= self.zobrist[self.get(row, col) or 0][cell] ^ \
+            self.zobrist[item or 0][cell]
+        if self.packed:
+            shift = (row*self.cols + col) * self.cellbits
+            self.state = (self.state & ~(self.cellmask << shift)) | \
+                ((item or 0) << shift)
+        else:
+            self._board[row][col] = item
+
+    def get(self, row, col):
+        "get an item"
+        if self.packed:
+            shift = (row*self.cols + col) * self.cellbits
+            return (self.state >> shift) & self.cellmask or None
+        return self._board[row][col]
+    
+    def solvable(self, tiles, verbose=False):
+        """solvable - Determines if a puzzle is solvable
+
+            Given a list of tiles, determine if the N-puzzle is solvable.
+            You do not need to know how to do this, but the calculation
+            is based on the inversion order.
+
+            for each number in the list of tiles,
+               How many following numbers are less than that one
+               e.g. [13, 10, 11, 6, 5, 7, 4, 8, 1, 12, 14, 9, 3, 15, 2, None]
+               Example:  Files following 9:  [3, 15, 2, None]
+               Two of these are smaller than 9, so the inversion order
+                   for 9 is 2
+
+            A puzzle's inversion order is the sum of the tile inversion
+            orders.  For puzzles with even numbers of rows and columns,
+            the row number on which the blank resides must be added.
+            Note that we need not worry about 1 as there are
+            no tiles smaller than one.
+
+            See Wolfram Mathworld for further explanation:
+                http://mathworld.wolfram.com/15Puzzle.html
+            and http://www.cut-the-knot.org/pythagoras/fifteen.shtml
+
+            This lets us know if a problem can be solved.  The inversion
+            order modulo 2 is invariant across moves.  This means that
+            when we make a legal move, the inversion order will always
+            be even or odd.  The solution state always has an even
+            inversion order, so any puzzle with an odd inversion
+            number cannot be solved.
+        """
+
+        # Make life easy, remove the blank (None or 0)
+        reduced = [t for t in tiles if t]
+        inversionorder = count_inversions(reduced, verbose)
+
+        # Account for blank when there are an even number of rows
+        if self.get_rows() % 2 == 0:
+            if verbose:
+                print("Even # rows, adding for position of blank")
+            blank = [idx for idx, t in enumerate(tiles) if not t][0]
+            inversionorder = inversionorder + \
+                math.floor(blank / self.boardsize)+1
+
+        solvable = inversionorder % 2 == 0  # Solvable if even
+        return solvable
+
+    @classmethod
+    def solvable_states(cls, n, states):
+        """solvable_states(n, states) - Validate many force_state lists
+        Returns a list of booleans, one per state, that is True when the
+        state holds exactly the tiles 1:n and a blank (None or 0) and is
+        solvable.
+        Intended for importing instance files, the board geometry is
+        worked out once for the whole batch rather than per state.
+        """
+        boardsize = int(math.sqrt(n+1))
+        if boardsize * boardsize != n+1:
+            raise ValueError("Bad board size\n" +
+                "Must be one less than an odd perfect square 8, 24, ...")
+        expected = set(range(1, n+1))
+        evenrows = boardsize % 2 == 0
+
+        results = []
+        for tiles in states:
+            reduced = [t for t in tiles if t]
+            if len(tiles) != n+1 or len(reduced) != n or \
+                    set(reduced) != expected:
+                results.append(False)
+                continue
+            inversionorder = count_inversions(reduced)
+            if evenrows:
+                blank = [idx for idx, t in enumerate(tiles) if not t][0]
+                inversionorder += blank // boardsize + 1
+            results.append(inversionorder % 2 == 0)
+        return results
+                                
+    def __hash__(self):
+        "__hash__ - Hash the board state"
+        
+        # Zobrist hash is maintained incrementally by place and move
+        return self.zhash
+    
+    def __eq__(self, other):
+        "__eq__ - Check if objects equal:  a == b"
+
+        # Different hashes can never be the same state
+        if self.zhash != other.zhash:
+            return False
+        # Packed boards of the same size compare their integers
+        if self.packed and other.packed and self.cellbits == other.cellbits:
+            return self.state == other.state
+        # Are states identical?
+        return self.state_tuple() == other.state_tuple()
+
+        # Set pairs to be equal to another
+        # equal = True  # until we found out otherwise
+        # # pair up board items in tuples and compare them
+        # for (mystate, otherstate) in zip(self.state_tuple(), other.state_tuple()):
+        #     equal = mystate == otherstate
+        #     if not equal:
+        #         break
+        # return equal
+    
+    def state_tuple(self):
+        "state_tuple - Return board state as a single tuple"
+        
+        if self.packed:
+            # Unpack one field per cell, 0 is the blank
+            state, bits, mask = self.state, self.cellbits, self.cellmask
+            return tuple((state >> (idx*bits)) & mask or None
+                         for idx in range(self.rows * self.cols))
+        # Iterate over the items in each list, merging them
+        flattened = [item for sublist in self.board
+                            for item in sublist]
+        # convert to tuple (hashable) and return 
+        return(tuple(flattened))
+    
+    def get_actions(self):
+        "Return row column offsets of where the empty tile can be moved"
+        
+        # Offsets come from the precomputed table for this board size,
+        # e.g. move up --> [-1, 0], move right --> [0, 1]
+        # The table is shared by every board of this size, so return
+        # fresh lists: callers may reorder the actions or modify one,
+        # and each becomes the action of a search Node.
+        return [list(offset) for offset in self.transitions[self.blank][0]]
+            
+    def clone(self, tiles=None):
+        """clone - Return an independent TileBoard with the same state
+        The per size tables, goals and goal index are shared.  If tiles
+        is given (row-major, None or 0 for the blank) the new board holds
+        those tiles instead, e.g. clone(goal) for each of self.goals.
+        No solvability check is done."""
+
+        if self.packed:
+            # Shallow copy shares goals and geometry, the packed state
+            # is an integer so the copy is already independent
+            board = copy.copy(self)
+        else:
+            # The memo keeps the shared per size tables from being copied.
+            shared = (self.zobrist, self.transitions, self.goalindex,
+                      self.goals)
+            board = copy.deepcopy(self, {id(obj): obj for obj in shared})
+
+        if tiles is not None:
+            # Start from an empty board, place rebuilds the Zobrist hash
+            if board.packed:
+                board.state = 0
+            else:
+                board.board = [[None] * self.cols for _ in range(self.rows)]
+            board.zhash = 0
+            board.lastmove = None
+            for idx, tile in enumerate(tiles):
+                (r, c) = divmod(idx, self.cols)
+                if tile:
+                    board.place(r, c, tile)
+                else:
+                    board.empty = (r, c)
+                    board.blank = idx
+        return board
+
+    def slide(self, offset):
+        """slide - Move the empty space by [delta_row, delta_col] in place
+        Returns the offset that moves it back, so a depth first search
+        can undo a move with board.slide(board.slide(offset)) without
+        allocating new boards.
+        """
+
+        # Current row and column of empty space
+        (r, c) = self.empty
+
+        [delta_r, delta_c] = offset
+
+        # validate and find the new blank position in the table
+        try:
+            target = self.transitions[self.blank][1][(delta_r, delta_c)]
+        except KeyError:
+            raise ValueError("Illegal move (%d,%d) from (%d,%d)"%(
+                    delta_r, delta_c, r, c))
+        (rprime, cprime) = divmod(target, self.cols)
+
+        if self.packed:
+            shift = target * self.cellbits
+            tile = (self.state >> shift) & self.cellmask
+            self.state = self.state - (tile << shift) + \
+                (tile << (self.blank * self.cellbits))
+            # Tile leaves target cell and enters the old blank cell
+            keys = self.zobrist[tile]
+            self.zhash ^= keys[target] ^ keys[self.blank]
+        else:
+            tile = self.get(rprime, cprime)
+            # Slide a tile into the empty slot position
+            self.place(r, c, tile)
+            # update empty position
+            self.place(rprime, cprime, None)
+        self.lastmove = (tile, target, self.blank)
+        self.empty = (rprime, cprime)
+        self.blank = target
+
+        return [-delta_r, -delta_c]
+
+    def move(self, offset):
+        """move - Move the empty space by [delta_row, delta_col] and 
+        return new TileBoard
+        """
+
+        # Copy the board so that sliding does not modify this one
+        newboard = self.clone()
+        newboard.slide(offset)
+        return newboard
+        
+    #def __repr__(self):
+    #    """Alternate board representation - as state tuple
+    #       Useful for verifying that solutions do not have duplicate
+    #       states in path."""
+    #    return str(self.state_tuple())
+    
+    def solved(self):
+        "solved - Is the puzzle solved?"
+
+        # Check if state is in goals, constant time through the index
+        solved = self in self.goalindex
         return solved
\ No newline at end of file
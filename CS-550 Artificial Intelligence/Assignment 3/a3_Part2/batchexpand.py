@@ -0,0 +1,224 @@
+'''
+batchexpand - Expand a slice of an N-puzzle search frontier at once.
+
+Boards in the slice are stored as a 2D uint8 array, one row per board in
+row-major order with 0 for the blank.  Successors, their Zobrist hashes
+and (optionally) their heuristic values are computed with vectorized
+NumPy operations.  Repeated and already explored children are dropped
+before any board or Node is built, the rest are handed back as search
+Nodes.
+
+Requires NumPy and packed TileBoard states (TileBoard(..., packed=True)).
+'''
+
+import copy
+import math
+
+import numpy as np
+
+from basicsearch_lib02.searchrep import Node
+from basicsearch_lib02.tileboard import TileBoard
+
+
+def manhattan_batch(states):
+    """manhattan_batch(states) - City block distance for a batch of boards
+    states is a 2D uint8 array with one board per row.  Distances are to
+    the single goal with the blank in the bottom right, so tile t belongs
+    in cell t-1.  Returns an integer array with one value per board.
+    Suitable as the h_batch hook of BatchExpander and graph_search.
+    """
+    cells = states.shape[1]
+    boardsize = math.isqrt(cells)
+    cell = np.arange(cells)
+    goal = states.astype(np.intp) - 1  # goal cell of each tile
+    dist = np.abs(goal // boardsize - cell // boardsize) + \
+        np.abs(goal % boardsize - cell % boardsize)
+    # The blank does not count
+    return np.where(states != 0, dist, 0).sum(axis=1)
+
+
+class BatchExpander:
+    """BatchExpander(problem, h_batch)
+    Expands many N-puzzle search nodes in one call.
+
+    problem - NPuzzle (or other Problem) whose states are packed TileBoards
+    h_batch - optional batch heuristic hook, h_batch(states) takes a 2D
+        uint8 array of boards and returns one heuristic value per row.
+        It must agree with problem.h.  When None, problem.h is called
+        for each child.
+    """
+
+    def __init__(self, problem, h_batch=None):
+        board = problem.initial
+        if not getattr(board, "packed", False):
+            raise ValueError(
+                "Batch expansion requires packed TileBoard states")
+
+        self.problem = problem
+        self.h_batch = h_batch
+        self.boardsize = board.boardsize
+        self.cells = self.boardsize * self.boardsize
+        self.cellbits = board.cellbits
+
+        # Moves padded to 4 per blank position, -1 marks a missing move.
+        # actions[blank][slot] is the offset that moves the blank to
+        # targets[blank, slot]
+        table = TileBoard.transition_table(self.boardsize)
+        self.actions = [actions for (actions, _) in table]
+        self.targets = np.full((self.cells, 4), -1, dtype=np.intp)
+        for blank, (actions, targets) in enumerate(table):
+            for slot, action in enumerate(actions):
+                self.targets[blank, slot] = targets[tuple(action)]
+
+        self.zobrist = np.array(TileBoard.zobrist_table(self.boardsize),
+                                dtype=np.uint64)
+        # Packed states of the 8 and 15 puzzle fit in a uint64,
+        # larger boards fall back to Python integers
+        self.fits64 = self.cells * self.cellbits <= 64
+        self.shifts = np.arange(self.cells, dtype=np.uint64) * \
+            np.uint64(self.cellbits)
+
+    def encode(self, boards):
+        "encode(boards) - 2D uint8 array of tiles, one row per packed board"
+        if self.fits64:
+            packed = np.array([b.state for b in boards], dtype=np.uint64)
+            mask = np.uint64((1 << self.cellbits) - 1)
+            return ((packed[:, None] >> self.shifts) & mask).astype(np.uint8)
+        return np.array([[t or 0 for t in b.state_tuple()] for b in boards],
+                        dtype=np.uint8)
+
+    def pack(self, states):
+        "pack(states) - list of packed integers, one per row of states"
+        if self.fits64:
+            # Fields do not overlap, so the sum is a bitwise or
+            return (states.astype(np.uint64) << self.shifts).sum(
+                axis=1, dtype=np.uint64).tolist()
+        bits = self.cellbits
+        return [sum(tile << (idx*bits) for idx, tile in enumerate(row))
+                for row in states.tolist()]
+
+    def successors(self, states, hashes):
+        """successors(states, hashes) - All children of a batch of boards
+        states - 2D uint8 array, one board per row
+        hashes - uint64 array of the boards' Zobrist hashes
+
+        Returns (children, parents, slots, childhashes):
+            children - 2D uint8 array, one child board per row
+            parents - row of states each child came from
+            slots - index of the child's action in the parent's
+                get_actions() list
+            childhashes - uint64 Zobrist hashes of the children
+        Children are ordered by parent, then by action.
+        """
+        blanks = np.argmin(states, axis=1)  # blank is the only 0
+        moves = self.targets[blanks]
+        parents, slots = np.nonzero(moves >= 0)
+        sources = blanks[parents]  # old blank cell, receives the tile
+        targets = moves[parents, slots]  # new blank cell
+        rows = np.arange(len(parents))
+
+        children = states[parents]  # fancy indexing copies the rows
+        tiles = children[rows, targets]
+        children[rows, sources] = tiles
+        children[rows, targets] = 0
+
+        # Tile leaves target cell and enters the old blank cell
+        childhashes = hashes[parents] ^ self.zobrist[tiles, targets] ^ \
+            self.zobrist[tiles, sources]
+        return children, parents, slots, childhashes
+
+    def keys(self, states):
+        """keys(states) - exact keys of a batch of boards
+        A uint64 array of packed states when they fit, otherwise a list
+        of packed integers."""
+        if self.fits64:
+            return (states.astype(np.uint64) << self.shifts).sum(
+                axis=1, dtype=np.uint64)
+        return self.pack(states)
+
+    def survivors(self, nodes, keys, parents, explored):
+        """survivors(nodes, keys, parents, explored) - children worth a Node
+        Returns the indices, in order, of the children that are neither
+        a repeat of a cheaper (or earlier, at equal cost) child in the
+        batch nor, when explored is given, a state already explored."""
+        costs = [node.g for node in nodes]
+        if self.fits64:
+            # Sort by state then parent cost, keep each state's first
+            order = np.lexsort((np.array(costs)[parents], keys))
+            ordered = keys[order]
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = ordered[1:] != ordered[:-1]
+            keep = np.sort(order[first])
+            if explored is not None:
+                # Going back to the grandparent is always explored
+                grand = np.array([(node.parent or node).state.state
+                                  for node in nodes], dtype=np.uint64)
+                keep = keep[keys[keep] != grand[parents[keep]]]
+            keep = keep.tolist()
+        else:
+            best = {}
+            for idx, (key, p) in enumerate(zip(keys, parents.tolist())):
+                if key not in best or costs[p] < costs[parents[best[key]]]:
+                    best[key] = idx
+            keep = sorted(best.values())
+        return keep
+
+    def expand(self, nodes, explored=None):
+        """expand(nodes, explored) - List the child Nodes of every node
+        Equivalent to concatenating node.expand(problem) for each node,
+        except that of children with the same state only the one with
+        the cheapest parent is kept, and children whose state is in the
+        explored set explored (when given) are dropped.  graph_search
+        would discard them anyway, here no board or Node is built for
+        them.
+        """
+        if not nodes:
+            return []
+        boards = [node.state for node in nodes]
+        states = self.encode(boards)
+        hashes = np.array([b.zhash for b in boards], dtype=np.uint64)
+
+        children, parents, slots, childhashes = \
+            self.successors(states, hashes)
+        keys = self.keys(children)
+        keep = self.survivors(nodes, keys, parents, explored)
+        packed = keys.tolist() if self.fits64 else keys
+        childhashes = childhashes.tolist()
+        parents = parents.tolist()
+        slots = slots.tolist()
+
+        if explored is not None:
+            # Look the children up with one reused board
+            probe = copy.copy(boards[0])
+            unexplored = []
+            for idx in keep:
+                probe.state = packed[idx]
+                probe.zhash = childhashes[idx]
+                if not explored.exists(probe):
+                    unexplored.append(idx)
+            keep = unexplored
+
+        children = children[keep]
+        blanks = np.argmin(children, axis=1).tolist()
+        # The tile moved went from the child's blank to the parent's
+        sources = [boards[parents[idx]].blank for idx in keep]
+        tiles = children[np.arange(len(keep)), sources].tolist()
+        if self.h_batch is not None:
+            hvalues = np.asarray(self.h_batch(children)).tolist()
+        else:
+            hvalues = [None] * len(keep)
+
+        expanded = []
+        for (row, idx) in enumerate(keep):
+            parent = nodes[parents[idx]]
+            # Shallow copy shares goals and per size tables, as in move
+            board = copy.copy(parent.state)
+            board.state = packed[idx]
+            board.blank = blanks[row]
+            board.empty = divmod(blanks[row], self.boardsize)
+            board.zhash = childhashes[idx]
+            board.lastmove = (tiles[row], blanks[row], sources[row])
+            action = self.actions[parent.state.blank][slots[idx]]
+            expanded.append(Node(self.problem, board, parent=parent,
+                                 action=action, h=hvalues[row]))
+        return expanded
@@ -0,0 +1,273 @@
+'''
+checkpoint - Save and resume long running graph searches
+
+A checkpoint is three files.  Two logs are only ever appended to:
+the explored log, filename + ".explored", has one fixed size record per
+explored node:
+    tiles:   one byte per cell (0 for the blank)
+    parent:  uint32 index in the log of the node's parent (NONE for
+             the initial state)
+    action:  uint8 position of the node's action in
+             problem.actions(parent state)
+and the frontier log, filename + ".frontier", one record per change
+of the frontier:
+    b"P" - a node was pushed: float64 g, float64 h, uint32 depth,
+           uint32 parent log index, uint8 action position, its tiles
+    b"R" - a node left the frontier (popped or replaced): uint32 number
+           of its b"P" record, counting from 0
+The snapshot, filename, is small and replaced whole at each checkpoint
+(written to a temporary file that is then renamed):
+    header:   b"GSCK", uint8 version, uint16 cells, initial state tiles
+    counters: uint64 nodes explored, uint32 records of the explored log
+              covered, uint64 bytes of the frontier log covered
+A checkpoint therefore writes only what changed since the previous one.
+Log records beyond the snapshot's counts (written after the last
+checkpoint) are discarded on resume.  The frontier is rebuilt from the
+pushed nodes that were not removed, from their tiles: neither boards
+nor paths are replayed, a node's path is read from the parent indices
+in the explored log only when it is asked for.
+
+States must be TileBoards (or provide state_tuple with small integer
+entries and clone(tiles)), frontier nodes must be reachable from
+problem.initial.
+'''
+
+import os
+import struct
+
+from basicsearch_lib02.searchrep import (Node, tile_bytes)
+
+MAGIC = b"GSCK"
+VERSION = 4
+HEADER = struct.Struct("<4sBH")
+COUNTERS = struct.Struct("<QIQ")
+LINK = struct.Struct("<IB")
+PUSH = struct.Struct("<cddIIB")
+REMOVE = struct.Struct("<cI")
+NONE = 0xFFFFFFFF
+
+
+class _LogPath(object):
+    """_LogPath(parents, actions, index) - moves to a logged node
+    Iterates over the action positions from the initial state to the
+    node with log index index, following parents (log index -> parent
+    log index) and actions (log index -> action position).  Restored
+    nodes keep one as their moves (see searchrep.Node.path), so deep
+    paths are neither built nor copied unless a solution needs them."""
+
+    def __init__(self, parents, actions, index):
+        self.parents = parents
+        self.actions = actions
+        self.index = index
+
+    def __iter__(self):
+        moves = bytearray()
+        index = self.index
+        while self.parents[index] != NONE:  # stop at the initial state
+            moves.append(self.actions[index])
+            index = self.parents[index]
+        moves.reverse()
+        return iter(moves)
+
+
+def initial_state(filename):
+    """initial_state(filename) - force_state list of a checkpointed search
+    Lets a driver rebuild the problem before resuming it."""
+    with open(filename, "rb") as f:
+        (magic, version, cells) = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a search checkpoint".format(filename))
+        return [tile or None for tile in f.read(cells)]
+
+
+class Checkpointer(object):
+    """Checkpointer(filename, problem, interval)
+    Periodically saves a graph search to filename (see graph_search's
+    checkpoint argument).  interval is the number of explored nodes
+    between checkpoints.  The search reports explored nodes and every
+    push to and removal from its frontier, they are appended to the
+    logs and flushed to disk at each checkpoint.
+    """
+
+    def __init__(self, filename, problem, interval=100000):
+        self.filename = filename
+        self.logname = filename + ".explored"
+        self.frontiername = filename + ".frontier"
+        self.problem = problem
+        self.interval = interval
+        self.cells = len(problem.initial.state_tuple())
+        self.record = self.cells + LINK.size
+        self.pending = bytearray()  # explored records since last save
+        self.changes = bytearray()  # frontier records since last save
+        self.count = 0  # explored records, including pending ones
+        self.pushes = 0  # push records, including pending ones
+        self.next_save = interval
+        self.log = None
+        self.frontier = None
+
+    def restore(self):
+        """restore() - Open the logs for writing
+        If filename holds a checkpoint, returns a tuple (frontier_nodes,
+        explored_states, nodes_explored) to continue from, otherwise
+        starts a new checkpoint and returns None."""
+        restored = None
+        if all(os.path.exists(name) for name in
+               (self.filename, self.logname, self.frontiername)):
+            with open(self.filename, "rb") as f:
+                snapshot = f.read()
+            restored = self._parse(snapshot)
+
+        if restored is None:
+            self.close()
+            self.log = open(self.logname, "wb")
+            self.frontier = open(self.frontiername, "wb")
+            self.count = 0
+            self.pushes = 0
+            # Nothing pushed yet, so initial_state can read the file
+            self.save(0)
+        else:
+            self.next_save = restored[2] + self.interval
+        return restored
+
+    def _parse(self, snapshot):
+        "_parse(snapshot) - search state of a snapshot and its logs"
+        (magic, version, cells) = HEADER.unpack_from(snapshot, 0)
+        offset = HEADER.size + cells
+        if magic != MAGIC or version != VERSION or cells != self.cells or \
+                snapshot[HEADER.size:offset] != tile_bytes(self.problem.initial):
+            raise ValueError("{} is not a checkpoint of this search".format(
+                self.filename))
+        (nodes_explored, count, length) = COUNTERS.unpack_from(snapshot,
+                                                               offset)
+        if not length:
+            return None  # saved before the search started
+
+        # Drop records written after the snapshot
+        self.log = open(self.logname, "r+b")
+        data = self.log.read(count * self.record)
+        self.frontier = open(self.frontiername, "r+b")
+        changes = self.frontier.read(length)
+        if len(data) != count * self.record or len(changes) != length:
+            raise ValueError("{} is truncated".format(self.filename))
+        for (log, size) in ((self.log, len(data)),
+                            (self.frontier, length)):
+            log.truncate(size)
+            log.seek(size)
+        self.count = count
+
+        template = self.problem.initial
+        states = []
+        parents = []
+        actions = bytearray()
+        for start in range(0, len(data), self.record):
+            link = start + self.cells
+            states.append(template.clone(data[start:link]))
+            (parent, action) = LINK.unpack_from(data, link)
+            parents.append(parent)
+            actions.append(action)
+
+        # Offsets of the push records, None once removed
+        pushed = []
+        offset = 0
+        while offset < length:
+            if changes[offset:offset+1] == b"P":
+                pushed.append(offset)
+                offset += PUSH.size + self.cells
+            else:
+                (_, number) = REMOVE.unpack_from(changes, offset)
+                pushed[number] = None
+                offset += REMOVE.size
+        self.pushes = len(pushed)
+
+        nodes = []
+        for (number, offset) in enumerate(pushed):
+            if offset is None:
+                continue
+            (_, g, h, depth, parent, action) = PUSH.unpack_from(changes,
+                                                                offset)
+            start = offset + PUSH.size
+            tiles = changes[start:start+self.cells]
+            node = Node(self.problem, template.clone(tiles), h=h)
+            node.g = g
+            node.f = g + h
+            node.depth = depth
+            if parent != NONE:
+                # A log entry for the node itself, only for its path
+                parents.append(parent)
+                actions.append(action)
+                node.moves = _LogPath(parents, actions, len(parents) - 1)
+            (node.logparent, node.logaction) = (parent, action)
+            node.logpush = number
+            nodes.append(node)
+        return (nodes, states, nodes_explored)
+
+    def _link(self, node):
+        "_link(node) - (parent log index, action position) of node"
+        if node.parent is None:
+            return (getattr(node, "logparent", NONE),
+                    getattr(node, "logaction", 0))
+        actions = self.problem.actions(node.parent.state)
+        return (node.parent.logindex, actions.index(node.action))
+
+    def explored(self, node):
+        "explored(node) - note a node whose state joined the explored set"
+        node.logindex = self.count
+        self.count += 1
+        self.pending += tile_bytes(node.state)
+        self.pending += LINK.pack(*self._link(node))
+
+    def pushed(self, node):
+        "pushed(node) - note a node added to the frontier"
+        node.logpush = self.pushes
+        self.pushes += 1
+        self.changes += PUSH.pack(b"P", node.g, node.h, node.depth,
+                                  *self._link(node))
+        self.changes += tile_bytes(node.state)
+
+    def removed(self, node):
+        "removed(node) - note a node that left the frontier"
+        self.changes += REMOVE.pack(b"R", node.logpush)
+
+    def due(self, nodes_explored):
+        "due(nodes_explored) - is it time for a checkpoint?"
+        return nodes_explored >= self.next_save
+
+    def save(self, nodes_explored):
+        """save(nodes_explored) - write a checkpoint
+        Appends the records since the last checkpoint to the logs, then
+        replaces the snapshot with one covering them."""
+        for (log, records) in ((self.log, self.pending),
+                               (self.frontier, self.changes)):
+            log.write(records)
+            log.flush()
+            os.fsync(log.fileno())
+        self.pending = bytearray()
+        self.changes = bytearray()
+
+        temporary = self.filename + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.cells))
+            f.write(tile_bytes(self.problem.initial))
+            f.write(COUNTERS.pack(nodes_explored, self.count,
+                                  self.frontier.tell()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.filename)
+        self.next_save = nodes_explored + self.interval
+
+    def close(self):
+        "close() - close the logs"
+        for log in (self.log, self.frontier):
+            if log is not None:
+                log.close()
+        self.log = None
+        self.frontier = None
+
+    def discard(self):
+        """discard() - close and delete the checkpoint files
+        For a search that has finished, so that running it again starts
+        over rather than resuming."""
+        self.close()
+        for name in (self.filename, self.logname, self.frontiername):
+            if os.path.exists(name):
+                os.remove(name)
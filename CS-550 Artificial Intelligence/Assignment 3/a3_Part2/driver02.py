@@ -1,44 +1,106 @@
-'''
-driver for graph search problem
-'''
-
-from statistics import (mean, stdev)  # Only available in Python 3.4 and newer
-
-from npuzzle import NPuzzle
-from basicsearch_lib02.tileboard import TileBoard
-from searchstrategies import (BreadthFirst, DepthFirst, Manhattan)
-from problemsearch import graph_search
-import collections
-import time
-import searchstrategies
-
-
-class Timer:
-    """Timer class
-    Usage:
-      t = Timer()
-      # figure out how long it takes to do stuff...
-      elapsed_s = t.elapsed_s() OR elapsed_min = t.elapsed_min()
-    """
-    
-    def __init__(self):
-        "Timer - Start a timer"
-        self.s_per_min = 60.0  # Number seconds per minute
-        self.start = time.time()
-
-    def elapsed_s(self):
-        "elapsed_s - Seconds elapsed since start (wall clock time)"
-        return time.time() - self.start
-
-    def elapsed_min(self):
-        "elapsed_min - Minutes elapsed since start (wall clock time)"
-
-        # Get elapsed seconds and convert to minutes
-        return self.elapsed_s() / self.s_per_min
-    
-def driver() :
-
-    raise NotImplemented
-
-if __name__ == '__main__':
-    driver()
+'''
+driver for graph search problem
+'''
+
+from statistics import (mean, stdev)  # Only available in Python 3.4 and newer
+
+from npuzzle import NPuzzle
+from basicsearch_lib02.tileboard import TileBoard
+from searchstrategies import (BreadthFirst, DepthFirst, Manhattan)
+from problemsearch import graph_search
+from checkpoint import (Checkpointer, initial_state)
+import collections
+import os
+import random
+import time
+import searchstrategies
+
+
+class Timer:
+    """Timer class
+    Usage:
+      t = Timer()
+      # figure out how long it takes to do stuff...
+      elapsed_s = t.elapsed_s() OR elapsed_min = t.elapsed_min()
+    """
+    
+    def __init__(self):
+        "Timer - Start a timer"
+        self.s_per_min = 60.0  # Number seconds per minute
+        self.start = time.time()
+
+    def elapsed_s(self):
+        "elapsed_s - Seconds elapsed since start (wall clock time)"
+        return time.time() - self.start
+
+    def elapsed_min(self):
+        "elapsed_min - Minutes elapsed since start (wall clock time)"
+
+        # Get elapsed seconds and convert to minutes
+        return self.elapsed_s() / self.s_per_min
+    
+def driver(n=8, trials=31, strategies=(BreadthFirst, DepthFirst, Manhattan),
+           seed=None, checkpoint_dir=None, interval=100000):
+    """driver(n, trials, strategies, seed, checkpoint_dir, interval)
+    Solve trials random n puzzles with each search strategy and report
+    the mean and standard deviation of the number of moves, the nodes
+    explored and the time taken.
+
+    seed makes the puzzles reproducible.  If checkpoint_dir is given,
+    each search saves a checkpoint there every interval explored nodes.
+    Running the driver again with the same arguments (including seed)
+    resumes unfinished searches from their last checkpoint, the files of
+    finished searches are deleted; see resume to continue a single
+    search.
+    """
+    if seed is not None:
+        random.seed(seed)
+
+    # strategy name -> statistic -> list of values
+    stats = collections.defaultdict(lambda: collections.defaultdict(list))
+    for trial in range(trials):
+        puzzle = list(TileBoard(n).state_tuple())
+        for strategy in strategies:
+            name = strategy.__name__
+            problem = NPuzzle(n, force_state=puzzle,
+                              g=strategy.g, h=strategy.h)
+            checkpoint = None
+            if checkpoint_dir:
+                filename = os.path.join(checkpoint_dir, "{}-{}.ckpt".format(
+                    trial, name))
+                checkpoint = Checkpointer(filename, problem, interval)
+            timer = Timer()
+            (path, nodes_explored) = graph_search(problem,
+                                                  checkpoint=checkpoint)
+            if checkpoint:
+                checkpoint.discard()  # finished, a rerun starts over
+            stats[name]["moves"].append(len(path))
+            stats[name]["nodes"].append(nodes_explored)
+            stats[name]["seconds"].append(timer.elapsed_s())
+
+    for strategy in strategies:
+        name = strategy.__name__
+        report = []
+        for statistic in ("moves", "nodes", "seconds"):
+            values = stats[name][statistic]
+            spread = stdev(values) if len(values) > 1 else 0.0
+            report.append("{} {:.2f} (sd {:.2f})".format(
+                statistic, mean(values), spread))
+        print("{}: {}".format(name, ", ".join(report)))
+    return stats
+
+def resume(filename, strategy, interval=100000, verbose=False):
+    """resume(filename, strategy, interval, verbose) - Continue a search
+    from its checkpoint file.  strategy must be the searchstrategies
+    class the search was started with.  Returns graph_search's
+    (path, nodes_explored) and deletes the checkpoint files."""
+    puzzle = initial_state(filename)
+    problem = NPuzzle(len(puzzle)-1, force_state=puzzle,
+                      g=strategy.g, h=strategy.h)
+    checkpoint = Checkpointer(filename, problem, interval)
+    result = graph_search(problem, verbose=verbose, checkpoint=checkpoint)
+    checkpoint.discard()
+    return result
+
+if __name__ == '__main__':
+    driver()
@@ -1,33 +1,237 @@
-'''
-
-@author: mroch
-'''
-class Explored(object):
-    "Maintain an explored set.  Assumes that states are hashable"
-
-    def __init__(self):
-        "__init__() - Create an empty explored set"
-        self.explored_set = []
-        # raise NotImplemented
-        
-    def exists(self, state):
-        """exists(state) - Has this state already been explored?
-        Returns True or False, state must be hashable
-        """
-        return hash(state) in self.explored_set
-        # raise NotImplemented
-    
-    def add(self, state):
-        """add(state) - add given state to the explored set.  
-        state must be hashable and we asssume that it is not already in set
-        """
-        # The hash function is a Python builtin that generates
-        # a hash value from its argument.  Use this to create
-        # a dictionary key.  Handle collisions by storing 
-        # states that hash to the same key in a bucket list.
-        # Note that when you access a Python dictionary by a
-        # non existant key, it throws a KeyError
-
-        self.explored_set.append(hash(state))
-        # raise NotImplemented
-            
+'''
+
+@author: mroch
+'''
+
+import math
+import sys
+
+from basicsearch_lib02.tileboard import smaller_later
+
+
+class _ExploredSet(object):
+    """Methods shared by the explored sets, built on the exists, add and
+    count of each class"""
+
+    def exists_many(self, states):
+        "exists_many(states) - list of exists(state) for each state"
+        exists = self.exists
+        return [exists(state) for state in states]
+
+    def add_many(self, states):
+        """add_many(states) - add each of the given states
+        As with add, states are assumed not to be in the set already"""
+        add = self.add
+        for state in states:
+            add(state)
+
+    def __contains__(self, state):
+        "state in explored, same as exists"
+        return self.exists(state)
+
+    def __len__(self):
+        return self.count
+
+
+class Explored(_ExploredSet):
+    "Maintain an explored set.  Assumes that states are hashable"
+
+    def __init__(self):
+        "__init__() - Create an empty explored set"
+        # hash(state) -> bucket list of states with that hash
+        self.explored_set = {}
+        self.count = 0  # number of states stored
+        
+    def exists(self, state):
+        """exists(state) - Has this state already been explored?
+        Returns True or False, state must be hashable
+        """
+        # States with the same hash are only equal if == says so
+        try:
+            bucket = self.explored_set[hash(state)]
+        except KeyError:
+            return False
+        return state in bucket
+    
+    def add(self, state):
+        """add(state) - add given state to the explored set.  
+        state must be hashable and we asssume that it is not already in set
+        """
+        # The hash function is a Python builtin that generates
+        # a hash value from its argument.  Use this to create
+        # a dictionary key.  Handle collisions by storing 
+        # states that hash to the same key in a bucket list.
+        # Note that when you access a Python dictionary by a
+        # non existant key, it throws a KeyError
+
+        key = hash(state)
+        try:
+            self.explored_set[key].append(state)
+        except KeyError:
+            self.explored_set[key] = [state]
+        self.count += 1
+
+    def memory_usage(self, states=False):
+        """memory_usage(states) - approximate bytes used by the set
+        Counts the dictionary, its keys and the bucket lists.  The states
+        themselves are shared with the search nodes and only counted
+        (shallowly, with sys.getsizeof) when states is True."""
+        size = sys.getsizeof(self.explored_set)
+        for key, bucket in self.explored_set.items():
+            size += sys.getsizeof(key) + sys.getsizeof(bucket)
+            if states:
+                size += sum(sys.getsizeof(state) for state in bucket)
+        return size
+
+
+class PermutationExplored(_ExploredSet):
+    """PermutationExplored(n) - explored set of n puzzle states as a bitmap
+    Each state reachable from a solvable board is ranked to a unique
+    integer below (n+1)!/2 and recorded as one bit of a bytearray, so
+    exists and add are a few integer operations and the set never
+    holds on to states.
+
+    The rank is blank_cell * n!/2 + lexrank(tiles) // 2, where tiles
+    lists the tiles in row-major order skipping the blank.  Swapping the
+    last two tiles changes the lexicographic rank by one and the
+    inversion parity, and for a given blank cell only one parity is
+    reachable, so halving the rank loses nothing.  The bitmap has
+    (n+1)!/2 bits: 23 kB for the 8-puzzle, which is what it is meant
+    for (the 15-puzzle would need 1.3 TB).
+
+    Same interface as Explored.  All states must be reachable from one
+    another (e.g. the states of one search), states of the other parity
+    share ranks with them.
+    """
+
+    def __init__(self, n):
+        "__init__(n) - Create an empty explored set for an n puzzle"
+        self.n = n
+        self.factorials = [math.factorial(k) for k in range(n+1)]
+        self.half = self.factorials[n] // 2  # reachable tile orders
+        self.bits = bytearray(((n+1) * self.half + 7) // 8)
+        self.count = 0
+
+    def rank(self, state):
+        "rank(state) - unique integer below (n+1)!/2 for a reachable state"
+        tiles = state.state_tuple()
+        blank = tiles.index(None)
+        order = [tile for tile in tiles if tile is not None]
+        factorials = self.factorials
+        last = len(order) - 1
+        # Each tile's digit is the number of later tiles smaller than it
+        lexrank = 0
+        for (idx, smaller) in smaller_later(order):
+            lexrank += smaller * factorials[last - idx]
+        return blank * self.half + (lexrank >> 1)
+
+    def exists(self, state):
+        """exists(state) - Has this state already been explored?
+        Returns True or False"""
+        rank = self.rank(state)
+        return bool(self.bits[rank >> 3] & (1 << (rank & 7)))
+
+    def add(self, state):
+        """add(state) - add given state to the explored set
+        Adding a state that is already present has no effect"""
+        rank = self.rank(state)
+        mask = 1 << (rank & 7)
+        if not self.bits[rank >> 3] & mask:
+            self.bits[rank >> 3] |= mask
+            self.count += 1
+
+    def memory_usage(self, states=False):
+        """memory_usage(states) - bytes used by the bitmap
+        states is accepted for compatibility with Explored, no states
+        are stored."""
+        return sys.getsizeof(self.bits)
+
+
+class BloomExplored(_ExploredSet):
+    """BloomExplored(capacity, error_rate, budget) - approximate explored set
+    A Bloom filter: each state sets k bits of a bit array chosen by
+    double hashing hash(state).  exists never misses a state that was
+    added, but may wrongly report a new state as explored (a false
+    prune), so a search using it may skip states and can miss
+    solutions.  In exchange the set takes a few bits per state.
+
+    capacity - number of states the filter is sized for
+    error_rate - wanted false positive rate once capacity states are in
+    budget - optional limit on the size of the bit array in bytes, the
+        filter is shrunk to fit (and the error rate rises)
+
+    estimated_false_prunes estimates how many exists calls answered
+    True for a state that was never added: each negative answer is
+    certainly a new state, and a new state is answered positively with
+    the current false positive rate p, so every negative answer
+    accounts for p/(1-p) expected false prunes.  Tests with in do not
+    count.  graph_search calls exists once for each state it generates,
+    and again when it pops the state only if the frontier may return
+    duplicates (ExternalPriorityQueue), so every call is a real chance
+    of a false prune.
+
+    Same interface as Explored.
+    """
+
+    def __init__(self, capacity, error_rate=0.01, budget=None):
+        "__init__(capacity, error_rate, budget) - Create an empty filter"
+        ln2 = math.log(2)
+        bits = int(math.ceil(-capacity * math.log(error_rate) / ln2**2))
+        if budget is not None:
+            bits = min(bits, budget * 8)
+        self.m = max(bits, 8)
+        self.k = max(1, int(round(self.m / capacity * ln2)))
+        self.bits = bytearray((self.m + 7) // 8)
+        self.count = 0
+        self.rate = 0.0  # current false positive rate
+        self.estimated_false_prunes = 0.0
+
+    def _positions(self, state):
+        "_positions(state) - the k bit positions of a state"
+        # splitmix64 finalizer spreads the bits of weak hashes
+        mask = 0xFFFFFFFFFFFFFFFF
+        x = hash(state) & mask
+        x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & mask
+        x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & mask
+        x ^= x >> 31
+        h1 = x & 0xFFFFFFFF
+        h2 = (x >> 32) | 1  # odd step
+        m = self.m
+        return [(h1 + i*h2) % m for i in range(self.k)]
+
+    def __contains__(self, state):
+        """state in filter - exists without counting a negative answer
+        For lookups that should not count toward estimated_false_prunes,
+        e.g. diagnostics."""
+        bits = self.bits
+        for pos in self._positions(state):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def exists(self, state):
+        """exists(state) - Has this state (probably) been explored?
+        Returns True or False, False is always right"""
+        if state in self:
+            return True
+        if self.rate < 1.0:
+            self.estimated_false_prunes += self.rate / (1 - self.rate)
+        return False
+
+    def add(self, state):
+        "add(state) - add given state to the filter"
+        bits = self.bits
+        for pos in self._positions(state):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+        self.rate = self.false_positive_rate()
+
+    def false_positive_rate(self):
+        "false_positive_rate() - estimated chance a new state is reported"
+        return (1 - math.exp(-self.k * self.count / self.m)) ** self.k
+
+    def memory_usage(self, states=False):
+        """memory_usage(states) - bytes used by the bit array
+        states is accepted for compatibility with Explored, no states
+        are stored."""
+        return sys.getsizeof(self.bits)
@@ -0,0 +1,137 @@
+'''
+idastar - Iterative deepening A* search.
+
+Depth first searches bounded by f = g + h, the bound rising to the
+smallest f that exceeded it until a goal is found.  Nothing but the
+current path is stored, so memory stays constant however many nodes
+are explored (graph_search keeps every explored state and the whole
+frontier).
+
+A single board is changed in place as the search descends and changed
+back as it returns, with no Node or board allocated per state.  States
+must provide slide(action), which applies the action in place and
+returns the action undoing it (TileBoard does).  g and h come from the
+problem as for graph_search, e.g. NPuzzle(n, g=Manhattan.g,
+h=Manhattan.h) with a searchstrategies class.
+'''
+
+import time
+
+from basicsearch_lib02.searchrep import (Node, print_solution, replay)
+
+
+class IDAStar(object):
+    """IDAStar(problem)
+    Iterative deepening A* search of problem.  After solve, iterations
+    holds one (threshold, nodes explored, seconds) tuple per depth first
+    pass, and nodes_per_second() gives the overall rate.
+    """
+
+    def __init__(self, problem):
+        self.problem = problem
+        self.iterations = []
+        self.nodes_explored = 0
+        self.seconds = 0.0
+
+    def step_cost(self):
+        """step_cost() - cost of one move, from problem.g
+        The strategy's g is evaluated for the first move from the
+        initial state.  Every N-puzzle move costs the same, so g of
+        a path is its length times this cost."""
+        problem = self.problem
+        root = Node(problem, problem.initial)
+        action = problem.actions(problem.initial)[0]
+        cost = problem.g(root, action, root.child_node(action))
+        if cost <= 0:
+            raise ValueError(
+                "IDA* needs a positive move cost, g gave {}".format(cost))
+        return cost
+
+    def solve(self, verbose=False, debug=False):
+        """solve(verbose, debug) - Search for an optimal solution
+        Returns (path, nodes_explored) as graph_search does: the list
+        of actions from the initial state to a goal (None if there is
+        no solution) and the number of nodes explored.  If verbose is
+        True, each iteration's threshold, nodes explored and rate is
+        printed, then the solution as by graph_search.  If debug is
+        True, every node explored is displayed.
+        """
+        problem = self.problem
+        self.step = self.step_cost()
+        self.debug = debug
+        self.iterations = []
+        self.nodes_explored = 0
+        start = time.time()
+
+        state = problem.initial.clone()  # searched in place
+        threshold = problem.h(state)
+        path = []
+        found = False
+        while not found:
+            self.exceeded = None  # smallest f above threshold
+            before = self.nodes_explored
+            iteration = time.time()
+            found = self._search(state, 0, threshold, None, path)
+            seconds = time.time() - iteration
+            self.iterations.append(
+                (threshold, self.nodes_explored - before, seconds))
+            if verbose:
+                print("Threshold {}: {} nodes in {:.2f} s ({:.0f} nodes/s)"
+                      .format(threshold, self.nodes_explored - before,
+                              seconds, (self.nodes_explored - before) /
+                              seconds if seconds else 0))
+            if self.exceeded is None:
+                break  # nothing left beyond the threshold
+            threshold = self.exceeded
+        self.seconds = time.time() - start
+
+        if verbose:
+            print("{} nodes in {:.2f} s ({:.0f} nodes/s)".format(
+                self.nodes_explored, self.seconds, self.nodes_per_second()))
+            if found:
+                print_solution(replay(self.problem, path))
+            else:
+                print("No solution found")
+
+        return (path if found else None, self.nodes_explored)
+
+    def _search(self, state, g, threshold, back, path):
+        """_search(state, g, threshold, back, path) - depth first pass
+        Explores state, reached at cost g, and below it every state whose
+        f is within threshold.  back is the action returning to the
+        parent, which is never taken.  Actions leading to a goal are
+        left in path and state is left at the goal."""
+        problem = self.problem
+        self.nodes_explored += 1
+        if self.debug:
+            print("Explored {}: g={}\n{}".format(
+                self.nodes_explored, g, state))
+        if problem.goal_test(state):
+            return True
+        g = g + self.step
+        for action in problem.actions(state):
+            if action == back:
+                continue
+            undo = state.slide(action)
+            f = g + problem.h(state)
+            if f <= threshold:
+                path.append(action)
+                if self._search(state, g, threshold, undo, path):
+                    return True
+                path.pop()
+            elif self.exceeded is None or f < self.exceeded:
+                self.exceeded = f
+            state.slide(undo)
+        return False
+
+    def nodes_per_second(self):
+        "nodes_per_second() - rate of the last solve"
+        return self.nodes_explored / self.seconds if self.seconds else 0.0
+
+
+def ida_search(problem, verbose=False, debug=False):
+    """ida_search(problem, verbose, debug) - Iterative deepening A*
+    Drop in alternative to problemsearch.graph_search that runs in
+    constant memory.  Returns (path, nodes_explored), see IDAStar.solve.
+    """
+    return IDAStar(problem).solve(verbose, debug)
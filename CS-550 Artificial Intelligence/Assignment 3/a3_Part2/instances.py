@@ -0,0 +1,181 @@
+'''
+instances - Reproducible N-puzzle instance corpora
+
+Instances are generated from the goal (blank in the bottom right) in one
+of two ways:
+    walk  - random walk of exactly depth moves that never undoes the
+            previous move.  The optimal solution is at most depth moves.
+    exact - uniform sample of the states whose optimal solution is
+            exactly depth moves.  Found by breadth-first search from the
+            goal, so only practical for the 8-puzzle or small depths.
+
+Everything is driven by a seed, the same arguments always give the same
+instances regardless of how many processes are used.
+
+Corpus file format (all integers little endian):
+    header:  b"NPZC", uint8 version, uint16 n
+    records: uint16 scramble depth, then n+1 uint8 tiles in row-major
+             order with 0 for the blank
+Records have a fixed size so files can be streamed or indexed directly.
+'''
+
+import math
+import random
+import struct
+import multiprocessing
+
+from basicsearch_lib02.tileboard import TileBoard
+
+MAGIC = b"NPZC"
+VERSION = 1
+HEADER = struct.Struct("<4sBH")
+DEPTH = struct.Struct("<H")
+
+
+def goal_tiles(n):
+    "goal_tiles(n) - goal state of an n puzzle as a list, 0 for the blank"
+    return list(range(1, n+1)) + [0]
+
+
+def _boardsize(n):
+    boardsize = int(math.sqrt(n+1))
+    if boardsize * boardsize != n+1:
+        raise ValueError("Bad board size\n" +
+            "Must be one less than an odd perfect square 8, 24, ...")
+    return boardsize
+
+
+def random_walk(n, depth, rng):
+    """random_walk(n, depth, rng) - scramble the goal by depth random moves
+    rng is a random.Random instance.  The blank never moves straight
+    back to the cell it just left.  Returns a list of tiles, 0 for blank.
+    """
+    table = TileBoard.transition_table(_boardsize(n))
+    tiles = goal_tiles(n)
+    blank = n
+    previous = None
+    for _ in range(depth):
+        choices = [target for target in table[blank][1].values()
+                   if target != previous]
+        target = rng.choice(choices)
+        tiles[blank] = tiles[target]
+        tiles[target] = 0
+        previous = blank
+        blank = target
+    return tiles
+
+
+# Breadth-first layers from the goal, cached per (n, depth) in each
+# process so that repeated exact requests do not redo the search
+_layers = {}
+
+
+def depth_layer(n, depth):
+    """depth_layer(n, depth) - all states exactly depth moves from the goal
+    Returns a sorted list of tile tuples (0 for blank).  Sorting makes
+    sampling independent of set iteration order.
+    """
+    key = (n, depth)
+    if key not in _layers:
+        table = TileBoard.transition_table(_boardsize(n))
+        goal = tuple(goal_tiles(n))
+        seen = {goal}
+        layer = [goal]
+        for _ in range(depth):
+            nextlayer = []
+            for state in layer:
+                blank = state.index(0)
+                for target in table[blank][1].values():
+                    child = list(state)
+                    child[blank] = child[target]
+                    child[target] = 0
+                    child = tuple(child)
+                    if child not in seen:
+                        seen.add(child)
+                        nextlayer.append(child)
+            layer = nextlayer
+        _layers[key] = sorted(layer)
+    return _layers[key]
+
+
+def _chunk(args):
+    "_chunk(args) - generate one chunk of encoded records (pool worker)"
+    (n, depth, method, seed, chunkidx, count) = args
+    # String seeds are hashed deterministically by random.Random
+    rng = random.Random("{}:{}".format(seed, chunkidx))
+    if method == "exact":
+        layer = depth_layer(n, depth)
+        if not layer:
+            raise ValueError("No {} puzzle states at depth {}".format(
+                n, depth))
+        states = [rng.choice(layer) for _ in range(count)]
+    elif method == "walk":
+        states = [random_walk(n, depth, rng) for _ in range(count)]
+    else:
+        raise ValueError("Unknown method {}".format(method))
+    return b"".join([DEPTH.pack(depth) + bytes(state) for state in states])
+
+
+def _chunks(n, count, depth, method, seed, chunksize):
+    "_chunks - arguments for each chunk of a corpus"
+    for chunkidx, start in enumerate(range(0, count, chunksize)):
+        yield (n, depth, method, seed, chunkidx,
+               min(chunksize, count - start))
+
+
+def generate(n, count, depth, seed=0, method="walk", chunksize=10000):
+    """generate(n, count, depth, seed, method) - stream puzzle instances
+    Yields count force_state lists (None for the blank) suitable for
+    TileBoard and NPuzzle.  See the module documentation for method.
+    """
+    recordsize = DEPTH.size + n + 1
+    for args in _chunks(n, count, depth, method, seed, chunksize):
+        data = _chunk(args)
+        for offset in range(0, len(data), recordsize):
+            yield _decode(data[offset+DEPTH.size:offset+recordsize])
+
+
+def write_corpus(filename, n, count, depth, seed=0, method="walk",
+                 processes=None, chunksize=10000):
+    """write_corpus(filename, n, count, depth, seed, method, processes)
+    Generate count instances and stream them to filename.
+
+    Chunks of chunksize instances are produced in a pool of processes
+    (default: one per CPU, 1 generates in this process) and written in
+    order as they complete, so memory use is bounded by a few chunks.
+    Each chunk has its own seed, the file contents only depend on the
+    seed, not on the number of processes.
+    """
+    _boardsize(n)  # validate before starting any work
+    chunks = _chunks(n, count, depth, method, seed, chunksize)
+    with open(filename, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, n))
+        if processes == 1:
+            for data in map(_chunk, chunks):
+                f.write(data)
+        else:
+            with multiprocessing.Pool(processes) as pool:
+                for data in pool.imap(_chunk, chunks):
+                    f.write(data)
+
+
+def _decode(record):
+    "_decode(record) - tile bytes to a force_state list"
+    return [tile if tile else None for tile in record]
+
+
+def read_corpus(filename):
+    """read_corpus(filename) - stream (depth, force_state) pairs from a corpus
+    force_state is a list of tiles with None for the blank.
+    """
+    with open(filename, "rb") as f:
+        (magic, version, n) = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not an instance corpus".format(filename))
+        recordsize = DEPTH.size + n + 1
+        while True:
+            record = f.read(recordsize)
+            if len(record) < recordsize:
+                break
+            (depth,) = DEPTH.unpack(record[:DEPTH.size])
+            yield (depth, _decode(record[DEPTH.size:]))
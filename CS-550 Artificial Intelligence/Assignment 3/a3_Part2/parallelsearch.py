@@ -0,0 +1,224 @@
+'''
+parallelsearch - Hash distributed A* (HDA*) over several processes.
+
+Every state is owned by one worker process, chosen by its hash (the
+Zobrist hash for TileBoards) modulo the number of workers.  Each worker
+keeps the open list and the best known depth of its own states only.
+Children owned by other workers are buffered and sent to the owner's
+inbox in batches.
+
+Nodes travel as (tiles, g, h, moves): the state's tiles as bytes (0 for
+the blank), its depth and heuristic value, and the path from the initial
+state as one byte per move (the index of the action in the parent's
+problem.actions list, see searchrep.replay).  States must
+therefore provide state_tuple and clone(tiles) as TileBoard does, and
+moves must cost 1 so that g is the depth.
+
+Optimality: a goal only replaces the shared incumbent when it is
+shorter, and nodes whose f = g + h is no better than the incumbent are
+dropped.  With an admissible h the incumbent is optimal once no worker
+has anything left to expand.
+
+Termination: each worker counts the batches it sends and receives and
+flags itself idle when its open list and inbox are empty.  The parent
+process reads every worker's counters and flags twice.  It stops the
+search when both readings are the same, every worker is idle, and all
+batches sent have been received, so none are still in transit.  If a
+worker exits before that (an exception in problem.h, say) the parent
+terminates the others and raises RuntimeError rather than waiting.
+'''
+
+import heapq
+import itertools
+import math
+import multiprocessing
+import queue
+import time
+
+from basicsearch_lib02.searchrep import (print_solution, replay, tile_bytes)
+
+
+def _worker(index, problem, inboxes, results, incumbent, sent, received,
+            idle, done, batch_size, debug):
+    """_worker(...) - search the partition of states owned by index
+    Puts ("solution", cost, moves) on results for each improved goal and
+    ("done", nodes_explored) when told to stop."""
+    workers = len(inboxes)
+    inbox = inboxes[index]
+    template = problem.initial
+    opened = []  # heap of (f, -g, count, tiles, g, moves)
+    best = {}  # tiles -> smallest g seen
+    counter = itertools.count()
+    outgoing = [[] for _ in range(workers)]
+    nodes_explored = 0
+    since_flush = 0
+
+    def insert(tiles, g, h, moves):
+        # Keep the node if it is the shallowest path to its state
+        if best.get(tiles, g + 1) > g and g + h < incumbent.value:
+            best[tiles] = g
+            heapq.heappush(opened, (g + h, -g, next(counter), tiles, g, moves))
+
+    def flush():
+        for owner, batch in enumerate(outgoing):
+            if batch:
+                sent[index] += 1  # counted before it can be received
+                inboxes[owner].put(batch)
+                outgoing[owner] = []
+
+    while not done.is_set():
+        # Take in whatever has arrived, waiting briefly when idle
+        while True:
+            try:
+                batch = inbox.get(timeout=0.005) if not opened else \
+                    inbox.get_nowait()
+            except queue.Empty:
+                break
+            idle[index] = 0
+            received[index] += 1
+            for node in batch:
+                insert(*node)
+        if not opened:
+            flush()
+            idle[index] = 1
+            continue
+        idle[index] = 0
+
+        (f, _, _, tiles, g, moves) = heapq.heappop(opened)
+        if best[tiles] < g or f >= incumbent.value:
+            continue  # stale copy, or cannot beat the incumbent
+        nodes_explored += 1
+        state = template.clone(tiles)
+        if debug:
+            print("Worker {} explored {}: f={} g={}\n{}".format(
+                index, nodes_explored, f, g, state))
+        if problem.goal_test(state):
+            with incumbent.get_lock():
+                if g < incumbent.value:
+                    incumbent.value = g
+                    results.put(("solution", g, moves))
+            continue
+
+        for move, action in enumerate(problem.actions(state)):
+            child = problem.result(state, action)
+            h = problem.h(child)
+            if g + 1 + h >= incumbent.value:
+                continue
+            node = (tile_bytes(child), g + 1, h, moves + bytes([move]))
+            owner = hash(child) % workers
+            if owner == index:
+                insert(*node)
+            else:
+                outgoing[owner].append(node)
+                if len(outgoing[owner]) >= batch_size:
+                    sent[index] += 1
+                    inboxes[owner].put(outgoing[owner])
+                    outgoing[owner] = []
+        since_flush += 1
+        if since_flush >= batch_size:
+            # Do not keep other workers waiting on part filled batches
+            flush()
+            since_flush = 0
+
+    results.put(("done", nodes_explored))
+
+
+def parallel_search(problem, verbose=False, debug=False, workers=None,
+                    batch_size=64, poll=0.01):
+    """parallel_search(problem, verbose, debug, workers, batch_size, poll) -
+    Solve problem with hash distributed A* in workers processes (default
+    one per CPU).  f = depth + problem.h, so with an admissible h such as
+    searchstrategies.Manhattan.h the path found is optimal.
+
+    batch_size is the number of nodes sent to another worker at once,
+    a worker also sends what it has after every batch_size expansions.
+    poll is the number of seconds between the parent's termination
+    checks.  verbose and debug are as for graph_search, debug output
+    comes from the workers and may interleave.
+
+    problem is passed to the worker processes, so with a start method
+    other than fork its g and h must be picklable (searchstrategies
+    classmethods are, the default lambdas of Problem are not).
+
+    Returns a tuple (path, nodes_explored) as graph_search does,
+    nodes_explored summed over all workers.
+    """
+
+    workers = workers or multiprocessing.cpu_count()
+    inboxes = [multiprocessing.Queue() for _ in range(workers)]
+    results = multiprocessing.Queue()
+    incumbent = multiprocessing.Value("d", math.inf)
+    # One slot per worker, each written only by its owner
+    sent = multiprocessing.Array("q", workers, lock=False)
+    received = multiprocessing.Array("q", workers, lock=False)
+    idle = multiprocessing.Array("b", workers, lock=False)
+    done = multiprocessing.Event()
+
+    # The initial node counts as one batch sent by this process
+    initial = problem.initial
+    inboxes[hash(initial) % workers].put(
+        [(tile_bytes(initial), 0, problem.h(initial), b"")])
+    seeded = 1
+
+    processes = [multiprocessing.Process(
+        target=_worker, args=(index, problem, inboxes, results, incumbent,
+                              sent, received, idle, done, batch_size, debug))
+        for index in range(workers)]
+    for process in processes:
+        process.start()
+
+    def snapshot():
+        return (list(idle), list(sent), list(received))
+
+    def check_workers(running):
+        # Raise if a worker has exited other than with a code in running.
+        # Workers only exit after done is set, so until then any exit is
+        # a failure (its traceback is on stderr) the search cannot outlive
+        for (index, process) in enumerate(processes):
+            if process.exitcode not in running:
+                for other in processes:
+                    other.terminate()
+                raise RuntimeError(
+                    "parallel_search worker {} exited with code {}".format(
+                        index, process.exitcode))
+
+    previous = None
+    while True:
+        time.sleep(poll)
+        check_workers((None,))
+        current = snapshot()
+        (idles, sends, receives) = current
+        if current == previous and all(idles) and \
+                sum(sends) + seeded == sum(receives):
+            break
+        previous = current
+    done.set()
+
+    moves = None
+    nodes_explored = 0
+    finished = 0
+    cost = math.inf
+    while finished < workers:
+        try:
+            message = results.get(timeout=poll)
+        except queue.Empty:
+            check_workers((None, 0))
+            continue
+        if message[0] == "done":
+            finished += 1
+            nodes_explored += message[1]
+        elif message[1] < cost:
+            (_, cost, moves) = message
+    for process in processes:
+        process.join()
+
+    solution = None
+    if moves is not None:
+        path = replay(problem, moves, positions=True)
+        solution = [node.action for node in path[1:]]
+    if verbose:
+        if moves is not None:
+            print_solution(path)
+        else:
+            print("No solution found")
+    return (solution, nodes_explored)
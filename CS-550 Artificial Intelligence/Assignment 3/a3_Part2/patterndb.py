@@ -0,0 +1,291 @@
+'''
+patterndb - Additive pattern databases for the N-puzzle.
+
+A pattern is a set of tiles.  Its database holds, for every placement
+of those tiles, the fewest moves of pattern tiles needed to bring them
+to their goal cells (tile t in cell t-1).  Moves of the other tiles
+are free, so the values of disjoint patterns can be added and the sum
+is still an admissible heuristic.
+
+Databases are built by retrograde breadth first search from the goal
+over (pattern tile cells, blank cell).  Each layer first spreads over
+free blank moves, then takes the pattern tile moves that cost one.  A
+placement's value is the smallest depth of any blank cell with it.
+build does this in one process, build_parallel splits every layer over
+a pool of processes sharing the depth array.
+
+A placement is stored at its partial permutation rank: the tile cells,
+in the order the pattern lists the tiles, ranked lexicographically among
+all sequences of distinct cells.  A pattern of k tiles on a board of
+c cells needs c!/(c-k)! bytes.
+
+File format:
+    header: b"NPDB", uint8 version, uint8 cells, uint8 tiles in the
+            pattern, then the pattern's tiles, one uint8 each
+    table:  one uint8 per placement, in rank order
+Files are memory mapped when loaded, so the operating system pages
+in only the parts of large databases that a search uses.
+'''
+
+import math
+import mmap
+import multiprocessing
+import struct
+from multiprocessing import shared_memory
+
+from basicsearch_lib02.tileboard import TileBoard
+
+MAGIC = b"NPDB"
+VERSION = 1
+HEADER = struct.Struct("<4sBBB")
+UNSEEN = 255
+PENDING = 254  # build_parallel: in the current layer, not yet expanded
+
+
+def rank(cells, positions):
+    """rank(cells, positions) - partial permutation rank of positions
+    positions is a sequence of distinct cell indices in range(cells).
+    Ranks run from 0 to cells!/(cells-len(positions))! - 1."""
+    r = 0
+    for idx, position in enumerate(positions):
+        # Only cells not used by earlier entries are candidates
+        smaller = 0
+        for earlier in positions[:idx]:
+            if earlier < position:
+                smaller += 1
+        r = r * (cells - idx) + position - smaller
+    return r
+
+
+def unrank(cells, k, r):
+    "unrank(cells, k, r) - tuple of k cell indices with rank r"
+    digits = []
+    for idx in range(k-1, -1, -1):
+        (r, digit) = divmod(r, cells - idx)
+        digits.append(digit)
+    digits.reverse()
+    free = list(range(cells))
+    return tuple(free.pop(digit) for digit in digits)
+
+
+def _successors(state, neighbours, free):
+    """_successors(state, neighbours, free) - children of a search state
+    state is the pattern tiles' cells followed by the blank's cell.
+    If free, the children reached by moving the blank into a cell
+    without a pattern tile, otherwise those reached by moving a
+    pattern tile into the blank."""
+    k = len(state) - 1
+    blank = state[k]
+    for target in neighbours[blank]:
+        if target not in state:
+            if free:
+                yield state[:k] + (target,)
+        elif not free:
+            child = list(state)
+            child[state.index(target)] = blank
+            child[k] = target
+            yield tuple(child)
+
+
+def _neighbours(boardsize):
+    "_neighbours(boardsize) - cells next to each cell"
+    return [list(targets.values())
+            for (_, targets) in TileBoard.transition_table(boardsize)]
+
+
+def _start(boardsize, tiles):
+    "_start(boardsize, tiles) - goal state, blank in the bottom right"
+    return tuple(tile-1 for tile in tiles) + (boardsize * boardsize - 1,)
+
+
+def build(boardsize, tiles):
+    """build(boardsize, tiles) - pattern database for tiles
+    Returns a bytearray indexed by the rank of the tiles' cells.
+    Time and memory grow with cells!/(cells-len(tiles)-1)!, the number
+    of (pattern, blank) states searched.  See build_parallel to use
+    several processes."""
+    cells = boardsize * boardsize
+    k = len(tiles)
+    neighbours = _neighbours(boardsize)
+    depths = bytearray([UNSEEN]) * math.perm(cells, k+1)
+    table = bytearray([UNSEEN]) * math.perm(cells, k)
+
+    start = _start(boardsize, tiles)
+    depths[rank(cells, start)] = 0
+    table[rank(cells, start[:k])] = 0
+    layer = [start]
+    depth = 0
+    while layer:
+        # Moves into cells without a pattern tile are free, states
+        # found this way join the current layer (and are expanded)
+        for state in layer:
+            for child in _successors(state, neighbours, True):
+                r = rank(cells, child)
+                if depths[r] == UNSEEN:
+                    depths[r] = depth
+                    layer.append(child)
+        # Moving a pattern tile into the blank costs one
+        nextlayer = []
+        for state in layer:
+            for child in _successors(state, neighbours, False):
+                r = rank(cells, child)
+                if depths[r] == UNSEEN:
+                    depths[r] = depth + 1
+                    nextlayer.append(child)
+                    r = rank(cells, child[:k])
+                    if table[r] == UNSEEN:
+                        table[r] = depth + 1
+        layer = nextlayer
+        depth = depth + 1
+    return table
+
+
+# Shared memory and board geometry of a build_parallel pool worker
+_worker = None
+
+
+def _attach(depthsname, tablename, boardsize, k):
+    "_attach(...) - pool initializer, open the shared arrays"
+    global _worker
+    depths = shared_memory.SharedMemory(name=depthsname)
+    table = shared_memory.SharedMemory(name=tablename)
+    _worker = (depths, table, boardsize * boardsize, k,
+               _neighbours(boardsize))
+
+
+def _pass(args):
+    """_pass((depth, free, start, end)) - expand one slice of a layer
+    Expands the states in rank range(start, end) of the current layer.
+    With free, these are the PENDING states: each is given depth and
+    its free children not seen before become PENDING.  Children in
+    the slice itself are expanded at once.  Otherwise the states at
+    depth are expanded by pattern tile moves, and new children become
+    PENDING (the next layer).  Returns the number of states expanded
+    (free) or children written."""
+    (depth, free, start, end) = args
+    (depths, table, cells, k, neighbours) = _worker
+    depths = depths.buf
+    table = table.buf
+    count = 0
+    # Find the layer's states in a private copy of the slice, bytes.find
+    # scans in C.  States other workers add to the slice meanwhile are
+    # picked up by the next pass.
+    chunk = bytes(depths[start:end])
+    marker = bytes([PENDING if free else depth])
+    pos = chunk.find(marker)
+    stack = []
+    while True:
+        if stack:
+            r = stack.pop()
+        elif pos >= 0:
+            r = start + pos
+            pos = chunk.find(marker, pos + 1)
+        else:
+            break
+        if free:
+            depths[r] = depth
+            count += 1
+        for child in _successors(unrank(cells, k+1, r), neighbours, free):
+            c = rank(cells, child)
+            # Another worker may write the same byte at the same time,
+            # but always PENDING
+            if depths[c] == UNSEEN:
+                depths[c] = PENDING
+                if free:
+                    if start <= c < end:
+                        stack.append(c)
+                else:
+                    count += 1
+                    c = rank(cells, child[:k])
+                    if table[c] == UNSEEN:
+                        table[c] = depth + 1
+    return count
+
+
+def build_parallel(boardsize, tiles, processes=None, slices=None):
+    """build_parallel(boardsize, tiles, processes, slices) - pattern database
+    Same result, byte for byte, as build(boardsize, tiles), computed in
+    a pool of processes (default one per CPU).
+
+    The depths of all (pattern, blank) states are kept in one
+    multiprocessing.shared_memory array, the table in another.  Each
+    BFS layer is expanded in passes, every pass splitting the rank
+    range into slices (default four per process) handled by the pool.
+    New states of a layer are marked PENDING.  Passes over free blank
+    moves give PENDING states the layer's depth and mark their new
+    children, until a pass finds none.  One pass of pattern tile moves
+    then marks the next layer.  Without locks two workers may both find
+    a state unseen, but both mark it PENDING and it ends up with the
+    same depth, so the result does not depend on timing.
+    """
+    processes = processes or multiprocessing.cpu_count()
+    slices = slices or 4 * processes
+    cells = boardsize * boardsize
+    k = len(tiles)
+    size = math.perm(cells, k+1)
+    depths = shared_memory.SharedMemory(create=True, size=size)
+    table = shared_memory.SharedMemory(create=True,
+                                       size=math.perm(cells, k))
+    try:
+        depths.buf[:size] = bytes([UNSEEN]) * size
+        table.buf[:table.size] = bytes([UNSEEN]) * table.size
+        start = _start(boardsize, tiles)
+        depths.buf[rank(cells, start)] = PENDING
+        table.buf[rank(cells, start[:k])] = 0
+
+        step = -(-size // slices)
+        ranges = [(first, min(first + step, size))
+                  for first in range(0, size, step)]
+        with multiprocessing.Pool(processes, initializer=_attach,
+                                  initargs=(depths.name, table.name,
+                                            boardsize, k)) as pool:
+            depth = 0
+            while True:
+                while sum(pool.map(_pass, [(depth, True, first, last)
+                                           for (first, last) in ranges])):
+                    pass
+                if not sum(pool.map(_pass, [(depth, False, first, last)
+                                            for (first, last) in ranges])):
+                    break
+                depth = depth + 1
+        return bytearray(table.buf[:math.perm(cells, k)])
+    finally:
+        depths.close()
+        depths.unlink()
+        table.close()
+        table.unlink()
+
+
+def write(filename, boardsize, tiles, table):
+    "write(filename, boardsize, tiles, table) - save a database"
+    with open(filename, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, boardsize * boardsize,
+                            len(tiles)))
+        f.write(bytes(tiles))
+        f.write(table)
+
+
+class PatternDatabase(object):
+    """PatternDatabase(filename) - a database file, memory mapped
+    cells - number of cells on the board
+    tiles - the pattern's tiles, in rank order
+    table - bytes like view of the values, indexed by rank
+    """
+
+    def __init__(self, filename):
+        with open(filename, "rb") as f:
+            self.mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.cells, k) = HEADER.unpack_from(self.mapped, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a pattern database".format(filename))
+        self.tiles = tuple(self.mapped[HEADER.size:HEADER.size+k])
+        offset = HEADER.size + k
+        self.table = memoryview(self.mapped)[offset:]
+        if len(self.table) != math.perm(self.cells, k):
+            raise ValueError("{} is truncated".format(filename))
+
+    def value(self, position):
+        """value(position) - moves needed by the pattern's tiles
+        position[tile] is the cell index of each tile."""
+        return self.table[rank(self.cells,
+                               [position[tile] for tile in self.tiles])]
@@ -1,71 +1,376 @@
-'''
-problemsearch - Functions for seaarching.
-'''
-
-from basicsearch_lib02.searchrep import (Node, print_nodes)
-from basicsearch_lib02.queues import PriorityQueue 
-from explored import Explored
-        
-def graph_search(problem, verbose=False, debug=False):
-    """graph_search(problem, verbose, debug) - Given a problem representation
-    (instance of basicsearch_lib02.representation.Problem or derived class),
-    attempt to solve the problem.
-    
-    If debug is True, debugging information will be displayed.
-    
-    if verbose is True, the following information will be displayed:
-        
-        Number of moves to solution
-        List of moves and resulting puzzle states
-        Example:
-        
-            Solution in 25 moves        
-            Initial state
-                  0        1        2    
-            0     4        8        7    
-            1     5        .        2    
-            2     3        6        1    
-            Move 1 -  [0, -1]
-                  0        1        2    
-            0     4        8        7    
-            1     .        5        2    
-            2     3        6        1    
-            Move 2 -  [1, 0]
-                  0        1        2    
-            0     4        8        7    
-            1     3        5        2    
-            2     .        6        1    
-            
-            ... more moves ...
-            
-                  0        1        2    
-            0     1        3        5    
-            1     4        2        .    
-            2     6        7        8    
-            Move 22 -  [-1, 0]
-                  0        1        2    
-            0     1        3        .    
-            1     4        2        5    
-            2     6        7        8    
-            Move 23 -  [0, -1]
-                  0        1        2    
-            0     1        .        3    
-            1     4        2        5    
-            2     6        7        8    
-            Move 24 -  [1, 0]
-                  0        1        2    
-            0     1        2        3    
-            1     4        .        5    
-            2     6        7        8    
-        
-        If no solution were found (not possible with the puzzles we
-        are using), we would display:
-        
-            No solution found
-    
-    Returns a tuple (path, nodes_explored) where:
-    path - list of actions to solve the problem or None if no solution was found
-    nodes_explored - Number of nodes explored (dequeued from frontier)
-    """
-
-    raise NotImplemented
+'''
+problemsearch - Functions for seaarching.
+'''
+
+from basicsearch_lib02.searchrep import (Node, print_nodes, print_solution,
+                                          replay)
+import functools
+
+from basicsearch_lib02.queues import (IndexedPriorityQueue, TIEBREAKS,
+                                      tiebreak_policy)
+from explored import Explored
+        
+def graph_search(problem, verbose=False, debug=False, batch_size=None,
+                 h_batch=None, frontier=IndexedPriorityQueue,
+                 explored=Explored, checkpoint=None):
+    """graph_search(problem, verbose, debug, batch_size, h_batch, frontier,
+    explored, checkpoint) - 
+    Given a problem representation
+    (instance of basicsearch_lib02.representation.Problem or derived class),
+    attempt to solve the problem.
+    
+    If debug is True, debugging information will be displayed.
+    
+    if verbose is True, the following information will be displayed:
+        
+        Number of moves to solution
+        List of moves and resulting puzzle states
+        Example:
+        
+            Solution in 25 moves        
+            Initial state
+                  0        1        2    
+            0     4        8        7    
+            1     5        .        2    
+            2     3        6        1    
+            Move 1 -  [0, -1]
+                  0        1        2    
+            0     4        8        7    
+            1     .        5        2    
+            2     3        6        1    
+            Move 2 -  [1, 0]
+                  0        1        2    
+            0     4        8        7    
+            1     3        5        2    
+            2     .        6        1    
+            
+            ... more moves ...
+            
+                  0        1        2    
+            0     1        3        5    
+            1     4        2        .    
+            2     6        7        8    
+            Move 22 -  [-1, 0]
+                  0        1        2    
+            0     1        3        .    
+            1     4        2        5    
+            2     6        7        8    
+            Move 23 -  [0, -1]
+                  0        1        2    
+            0     1        .        3    
+            1     4        2        5    
+            2     6        7        8    
+            Move 24 -  [1, 0]
+                  0        1        2    
+            0     1        2        3    
+            1     4        .        5    
+            2     6        7        8    
+        
+        If no solution were found (not possible with the puzzles we
+        are using), we would display:
+        
+            No solution found
+    
+    Returns a tuple (path, nodes_explored) where:
+    path - list of actions to solve the problem or None if no solution was found
+    nodes_explored - Number of nodes explored (dequeued from frontier)
+    
+    If batch_size is given, up to batch_size nodes are removed from the
+    frontier and expanded together by batchexpand.BatchExpander, which
+    needs NumPy and packed TileBoard states.  h_batch is its batch
+    heuristic hook (see batchexpand.manhattan_batch), when None the
+    problem's h is used for each child.  The expander drops explored
+    and repeated children before building their Nodes.
+    
+    frontier is the priority queue class used for the frontier, called
+    as frontier(order=min, f=f) and defaulting to IndexedPriorityQueue.  Any class
+    with the PriorityQueue interface in basicsearch_lib02.queues may be
+    used, e.g. frontier=PriorityQueue for the sorted list version or
+    BucketPriorityQueue when f values are integers (all N-puzzle
+    strategies in searchstrategies).  frontier=IndexedFIFOQueue expands
+    nodes breadth first, whatever f is.  For an ExternalPriorityQueue
+    pass a callable that sets its budget and codec, its run files are
+    removed by calling its close method when the search ends.
+    
+    explored is called with no arguments to create the explored set,
+    default Explored.  It must provide exists (for children), in (for
+    popped nodes), add and add_many, as the classes in explored do.
+    E.g. explored=lambda: PermutationExplored(8) keeps the explored
+    8-puzzle states in a bitmap.
+    
+    checkpoint may be a checkpoint.Checkpointer.  If its file holds a
+    checkpoint of this search, the search resumes from it, otherwise a
+    new checkpoint is started.  Explored nodes and every push to and
+    removal from the frontier are logged, and written to disk with the
+    node count every checkpoint.interval explored nodes.  The files are
+    kept when the search ends, see checkpoint.Checkpointer.discard.
+    """
+
+    frontier = frontier(order=min, f=Node.get_f)
+    duplicates = getattr(frontier, "duplicates", False)
+    explored = explored()
+    nodes_explored = 0
+    restored = checkpoint.restore() if checkpoint else None
+    if restored:
+        (nodes, states, nodes_explored) = restored
+        frontier.extend(nodes)
+        explored.add_many(states)
+    else:
+        root = Node(problem, problem.initial)
+        frontier.append(root)
+        if checkpoint:
+            checkpoint.pushed(root)
+    if batch_size:
+        from batchexpand import BatchExpander
+        expander = BatchExpander(problem, h_batch)
+
+    found = None
+    while found is None and len(frontier) > 0:
+        # Remove the next node, or a slice of nodes in batch mode
+        nodes = []
+        while len(frontier) > 0 and len(nodes) < (batch_size or 1):
+            node = frontier.pop()
+            if checkpoint:
+                checkpoint.removed(node)
+            if duplicates and explored.exists(node.state):
+                # Duplicate left behind by a frontier that cannot
+                # replace every queued node (ExternalPriorityQueue).
+                # Other frontiers hold unexplored states only, checking
+                # them again would give approximate explored sets
+                # (BloomExplored) a second chance at a false prune.
+                continue
+            nodes_explored = nodes_explored + 1
+            if debug:
+                print("Explored {}: {}".format(nodes_explored, node))
+            if problem.goal_test(node.state):
+                found = node
+                break
+            explored.add(node.state)
+            if checkpoint:
+                checkpoint.explored(node)
+            nodes.append(node)
+        if found:
+            break
+
+        if batch_size:
+            # Explored and repeated children are already dropped
+            children = expander.expand(nodes, explored)
+        else:
+            children = [child for child in nodes[0].expand(problem)
+                        if not explored.exists(child.state)]
+        for child in children:
+            if child in frontier:
+                # Same state already waiting, keep the cheaper one
+                queued = frontier[child]
+                if child.get_f() < queued.get_f():
+                    del frontier[child]
+                    frontier.append(child)
+                    if checkpoint:
+                        checkpoint.removed(queued)
+                        checkpoint.pushed(child)
+            else:
+                frontier.append(child)
+                if checkpoint:
+                    checkpoint.pushed(child)
+
+        if checkpoint and checkpoint.due(nodes_explored):
+            checkpoint.save(nodes_explored)
+
+    if hasattr(frontier, "close"):
+        frontier.close()
+    if checkpoint:
+        checkpoint.close()
+
+    if verbose:
+        if found:
+            print_solution(found.path())
+        else:
+            print("No solution found")
+
+    solution = found.solution() if found else None
+    return (solution, nodes_explored)
+
+
+def _goal_states(problem):
+    """_goal_states(problem) - states to search backward from
+    problem.goals may hold states, or state tuples as NPuzzle's do, which
+    are made into boards with problem.initial.clone.  Goal tuples the
+    initial state cannot reach (wrong inversion parity) are dropped."""
+    initial = problem.initial
+    states = []
+    for goal in problem.goals:
+        if not hasattr(goal, "state_tuple"):
+            if not initial.solvable(list(goal)):
+                continue
+            goal = initial.clone(goal)
+        states.append(goal)
+    return states
+
+
+def _children(problem, node, h):
+    """_children(problem, node, h) - child Nodes of node
+    h(state) gives their heuristic values, 0 when h is None."""
+    children = []
+    for action in problem.actions(node.state):
+        state = problem.result(node.state, action)
+        children.append(Node(problem, state, parent=node, action=action,
+                             h=h(state) if h else 0))
+    return children
+
+
+def _splice(problem, forward, backward):
+    """_splice(problem, forward, backward) - join two half paths
+    forward is a Node of the search from the initial state and backward
+    a Node with the same state from the search back from a goal.
+    Returns the actions from the initial state to that goal."""
+    actions = forward.solution()
+    node = backward
+    while node.parent:
+        # Move that undoes the backward step to node
+        for action in problem.actions(node.state):
+            if problem.result(node.state, action) == node.parent.state:
+                actions.append(action)
+                break
+        node = node.parent
+    return actions
+
+
+def bidirectional_search(problem, verbose=False, debug=False, h_reverse=None):
+    """bidirectional_search(problem, verbose, debug, h_reverse) -
+    Search forward from problem.initial and backward from every goal in
+    problem.goals at once until the two searches meet.  Moves must be
+    reversible and cost 1 (path cost is depth), as in the N-puzzle.
+    
+    Each direction keeps a dictionary from state to Node of every state
+    it has reached, so a child is checked against the other direction
+    in constant time.  The half paths to the meeting state are spliced
+    into the same action list as Node.solution().
+    
+    Without h_reverse this is a blind breadth first meet in the middle:
+    the direction with the smaller frontier grows by one whole layer at
+    a time, and the first meeting found is a shortest path.  Each half
+    only searches about half the solution depth.
+    
+    With h_reverse, a front to end bidirectional A*: the forward search
+    is ordered by depth + problem.h and the backward search by depth +
+    h_reverse(state), an estimate of the distance back to the initial
+    state, e.g.
+        h_reverse=lambda state: Manhattan.h_to(state, problem.initial)
+    Nodes are taken from the smaller frontier.  The search stops when
+    the smallest f on a frontier is no better than the shortest path
+    found, which is optimal when both heuristics are admissible.
+    
+    verbose and debug are as for graph_search.  Returns a tuple
+    (path, nodes_explored), nodes_explored counting both directions.
+    """
+
+    start = Node(problem, problem.initial, h=0)
+    goals = [Node(problem, goal, h=0) for goal in _goal_states(problem)]
+    # Forward and backward: state -> shallowest Node reaching it
+    reached = ({start.state: start}, {goal.state: goal for goal in goals})
+    hs = (problem.h, h_reverse)
+    nodes_explored = 0
+    meet = None  # (forward node, backward node)
+
+    if problem.goal_test(problem.initial):
+        meet = (start, start)
+    elif h_reverse is None:
+        layers = ([start], goals)
+        while meet is None and layers[0] and layers[1]:
+            side = 0 if len(layers[0]) <= len(layers[1]) else 1
+            mine, other = reached[side], reached[1-side]
+            layer = []
+            for node in layers[side]:
+                nodes_explored = nodes_explored + 1
+                if debug:
+                    print("Explored {} ({}): {}".format(
+                        nodes_explored, ("forward", "backward")[side], node))
+                for child in _children(problem, node, None):
+                    if child.state in mine:
+                        continue
+                    if child.state in other:
+                        # Reached sets are disjoint up to here, so this
+                        # path is as short as any still unexplored
+                        pair = (child, other[child.state])
+                        meet = pair if side == 0 else pair[::-1]
+                        break
+                    mine[child.state] = child
+                    layer.append(child)
+                if meet:
+                    break
+            layers = (layer, layers[1]) if side == 0 else (layers[0], layer)
+    else:
+        f = lambda node: node.depth + node.h
+        frontiers = (IndexedPriorityQueue(min, f),
+                     IndexedPriorityQueue(min, f))
+        start.h = problem.h(start.state)
+        frontiers[0].append(start)
+        for goal in goals:
+            goal.h = h_reverse(goal.state)
+            frontiers[1].append(goal)
+        best = None  # length of the shortest path found
+        while len(frontiers[0]) > 0 and len(frontiers[1]) > 0:
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            mine, other = reached[side], reached[1-side]
+            node = frontiers[side].pop()
+            if best is not None and f(node) >= best:
+                break  # nothing left on this side can do better
+            nodes_explored = nodes_explored + 1
+            if debug:
+                print("Explored {} ({}): {}".format(
+                    nodes_explored, ("forward", "backward")[side], node))
+            for child in _children(problem, node, hs[side]):
+                if child.state in mine and \
+                        mine[child.state].depth <= child.depth:
+                    continue
+                mine[child.state] = child
+                frontiers[side].append(child)  # replaces a deeper copy
+                if child.state in other:
+                    length = child.depth + other[child.state].depth
+                    if best is None or length < best:
+                        best = length
+                        pair = (child, other[child.state])
+                        meet = pair if side == 0 else pair[::-1]
+
+    solution = _splice(problem, *meet) if meet else None
+    if verbose:
+        if meet:
+            print_solution(replay(problem, solution))
+        else:
+            print("No solution found")
+    return (solution, nodes_explored)
+
+
+def compare_tiebreaks(problem, policies=TIEBREAKS, seed=0, verbose=False):
+    """compare_tiebreaks(problem, policies, seed, verbose) - Solve the
+    same problem once per tie breaking policy (names from
+    basicsearch_lib02.queues.TIEBREAKS, seed is used by "random").
+    
+    Returns a dictionary mapping each policy name to the
+    (path, nodes_explored) tuple returned by graph_search.
+    If verbose is True, a table of moves and nodes explored is printed,
+    e.g. for NPuzzle(8, force_state=[1, 4, 6, 7, 5, 3, 8, None, 2],
+    g=Manhattan.g, h=Manhattan.h):
+    
+        policy      moves   explored
+        fifo           37        336
+        lifo           95        389
+        high_g        167        409
+        low_h          37        336
+        random         71        221
+    """
+    
+    results = {}
+    for name in policies:
+        frontier = functools.partial(IndexedPriorityQueue,
+                                     tiebreak=tiebreak_policy(name, seed))
+        results[name] = graph_search(problem, frontier=frontier)
+
+    if verbose:
+        lines = ["{:<8} {:>8} {:>10}".format("policy", "moves", "explored")]
+        for name in policies:
+            (path, nodes_explored) = results[name]
+            lines.append("{:<8} {:>8} {:>10}".format(
+                name, len(path) if path is not None else "-", nodes_explored))
+        print("\n".join(lines))
+    return results
\ No newline at end of file
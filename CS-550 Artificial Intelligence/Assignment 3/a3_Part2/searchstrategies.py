@@ -1,94 +1,545 @@
-"""
-searchstrategies
-
-Module to provide implementations of g and h for various search strategies.
-In each case, the functions are class methods as we don't need an instance
-of the class.  
-
-If you are unfamiliar with Python class methods, Python uses a function
-decorator (indicated by an @ to indicate that the next method is a class
-method).  Example:
-
-class SomeClass:
-    @classmethod
-    def foobar(cls, arg1, arg2):
-        "foobar(arg1, arg2) - does ..."
-        
-        code... class variables are accessed as cls.var (if needed)
-        return computed value
-
-A caller would import SomeClass and then call, e.g. :  
-    SomeClass.foobar("hola","amigos")
-
-Contains g and h functions for:
-BreadFirst - breadth first search
-DepthFirst - depth first search
-Manhattan - city block heuristic search.  To restrict the complexity of
-    this, you only need handle heuristics for puzzles with a single solution
-    where the blank is at the bottom right, e.g.:
-        123
-        456
-        78
-    When multiple solutions are allowed, the heuristic becomes a little more
-    complex as the city block distance must be estimated to each possible solution
-    state. 
-"""
-
-import math
-
-# For each of the following classes, create classmethods g and h
-# with the following signatures
-#       @classmethod
-#       def g(cls, parentnode, action, childnode):
-#               return appropritate g value
-#       @classmethod
-#        def h(cls, state):
-#               return appropriate h value
- 
-class BreadthFirst:
-    "BredthFirst - breadthfirst search"
-    @classmethod
-    def g(cls, parentnode, action, childnode):
-        #Because moving a tile costs 1 
-        if parentnode:
-            return 1
-        else:
-            return 0
-        # return appropritate g value
-    
-    @classmethod
-    def h(cls, state):
-        return 0
-        # return appropriate h value
-
-class DepthFirst:
-    "DepthFirst - depth first search"
-    @classmethod
-    def g(cls, parentnode, action, childnode): #To be h() 
-        if parentnode:
-            return -childnode.depth
-        else:
-            return 0
-        # return appropritate g value
-    
-    @classmethod
-    def h(cls, state): #To be g() 
-        return 1
-        # return appropriate h value
-        
-class Manhattan:
-    "Manhattan Block Distance heuristic"
-    @classmethod
-    def g(cls, parentnode, action, childnode):
-        #Because moving a tile costs 1 
-        if parentnode:
-            return 1
-        else:
-            return 0
-        # return appropritate g value
-    
-    @classmethod
-    def h(cls, state):
-        pos = list.index(None)
-        return (2 -  pos//3) + (2 -  pos%3)
-        # return appropriate h value
\ No newline at end of file
+"""
+searchstrategies
+
+Module to provide implementations of g and h for various search strategies.
+In each case, the functions are class methods as we don't need an instance
+of the class.  
+
+If you are unfamiliar with Python class methods, Python uses a function
+decorator (indicated by an @ to indicate that the next method is a class
+method).  Example:
+
+class SomeClass:
+    @classmethod
+    def foobar(cls, arg1, arg2):
+        "foobar(arg1, arg2) - does ..."
+        
+        code... class variables are accessed as cls.var (if needed)
+        return computed value
+
+A caller would import SomeClass and then call, e.g. :  
+    SomeClass.foobar("hola","amigos")
+
+Contains g and h functions for:
+BreadFirst - breadth first search
+DepthFirst - depth first search
+Manhattan - city block heuristic search.  To restrict the complexity of
+    this, you only need handle heuristics for puzzles with a single solution
+    where the blank is at the bottom right, e.g.:
+        123
+        456
+        78
+    When multiple solutions are allowed, the heuristic becomes a little more
+    complex as the city block distance must be estimated to each possible solution
+    state.  h_to gives the distance to any other board, e.g. back to the
+    initial state for bidirectional search.
+MultiGoalManhattan - city block heuristic for boards with multiple solutions
+    (TileBoard(multiple_solutions=True)), the distance to the closest goal.
+AdditivePatternDatabase - sum of disjoint pattern database values (see
+    patterndb), much stronger than Manhattan on the 15 and 24 puzzle.
+LinearConflict - Manhattan plus two moves for each tile that must leave
+    its goal row or column to let another pass.
+WalkingDistance - moves needed by the rows and columns of tiles alone,
+    looked up in a table built by breadth first search.
+LinearConflict and WalkingDistance update their value from the board
+    the last move was made on, rather than rescanning the board.
+"""
+
+import math
+import os
+
+import patterndb
+
+# For each of the following classes, create classmethods g and h
+# with the following signatures
+#       @classmethod
+#       def g(cls, parentnode, action, childnode):
+#               return appropritate g value
+#       @classmethod
+#        def h(cls, state):
+#               return appropriate h value
+ 
+class BreadthFirst:
+    "BredthFirst - breadthfirst search"
+    @classmethod
+    def g(cls, parentnode, action, childnode):
+        #Because moving a tile costs 1 
+        if parentnode:
+            return 1
+        else:
+            return 0
+        # return appropritate g value
+    
+    @classmethod
+    def h(cls, state):
+        return 0
+        # return appropriate h value
+
+class DepthFirst:
+    "DepthFirst - depth first search"
+    @classmethod
+    def g(cls, parentnode, action, childnode): #To be h() 
+        if parentnode:
+            return -childnode.depth
+        else:
+            return 0
+        # return appropritate g value
+    
+    @classmethod
+    def h(cls, state): #To be g() 
+        return 1
+        # return appropriate h value
+        
+class Manhattan:
+    "Manhattan Block Distance heuristic"
+    @classmethod
+    def g(cls, parentnode, action, childnode):
+        #Because moving a tile costs 1 
+        if parentnode:
+            return 1
+        else:
+            return 0
+        # return appropritate g value
+    
+    @classmethod
+    def h(cls, state):
+        # Tile t belongs in cell t-1, the blank does not count
+        size = state.boardsize
+        distance = 0
+        for cell, tile in enumerate(state.state_tuple()):
+            if tile:
+                distance += abs((tile-1) // size - cell // size) + \
+                    abs((tile-1) % size - cell % size)
+        return distance
+        # return appropriate h value
+
+    @classmethod
+    def h_to(cls, state, target):
+        """h_to(state, target) - city block distance from state to target
+        target is any board of the same size, e.g. the initial state for
+        the backward half of problemsearch.bidirectional_search."""
+        size = state.boardsize
+        cells = [0] * len(state.state_tuple())
+        for cell, tile in enumerate(target.state_tuple()):
+            cells[tile or 0] = cell
+        distance = 0
+        for cell, tile in enumerate(state.state_tuple()):
+            if tile:
+                distance += abs(cells[tile] // size - cell // size) + \
+                    abs(cells[tile] % size - cell % size)
+        return distance
+
+class MultiGoalManhattan(Manhattan):
+    """MultiGoalManhattan - Manhattan distance to the closest of several goals
+    Uses precomputed (tile, cell, goal) distance tables built once per
+    GoalIndex.  The distances of one tile in one cell to every goal are
+    packed into a single integer with a fixed width field per goal, so
+    adding the table entries for all tiles computes the Manhattan
+    distance to every goal at once.  Fields are wide enough that they
+    never carry into each other."""
+
+    # GoalIndex -> (table, bits per field, field mask, number of goals)
+    _tables = {}
+
+    @classmethod
+    def tables(cls, goalindex, boardsize):
+        "tables(goalindex, boardsize) - packed distance tables for goals"
+        try:
+            return cls._tables[goalindex]
+        except KeyError:
+            pass
+        cells = boardsize * boardsize
+        # Largest possible sum: every tile at the farthest distance
+        bits = ((cells - 1) * 2 * (boardsize - 1)).bit_length()
+        table = [[0] * cells for _ in range(cells)]  # [tile][cell]
+        for goal, position in enumerate(goalindex.positions):
+            for tile in range(1, cells):
+                (goal_r, goal_c) = divmod(position[tile], boardsize)
+                for cell in range(cells):
+                    (r, c) = divmod(cell, boardsize)
+                    distance = abs(goal_r - r) + abs(goal_c - c)
+                    table[tile][cell] |= distance << (goal * bits)
+        entry = (table, bits, (1 << bits) - 1, len(goalindex.positions))
+        cls._tables[goalindex] = entry
+        return entry
+
+    @classmethod
+    def h(cls, state):
+        (table, bits, mask, goals) = cls.tables(state.goalindex,
+                                                state.boardsize)
+        # One addition per tile sums the distances to all goals
+        total = 0
+        for cell, tile in enumerate(state.state_tuple()):
+            if tile:
+                total += table[tile][cell]
+        return min((total >> (goal * bits)) & mask for goal in range(goals))
+
+class AdditivePatternDatabase(Manhattan):
+    """AdditivePatternDatabase - disjoint additive pattern databases
+    patterns maps a board size to a partition of the tiles; h is the sum
+    of each pattern's database value.  Databases are memory mapped from
+    directory, by default npuzzle-pdb in the user's cache directory
+    ($XDG_CACHE_HOME or ~/.cache).  They must be built first, once, by
+    calling build(boardsize), h never builds them.  Building takes a
+    moment for the 8 puzzle but a long time for 6 tile patterns of
+    larger boards, set processes to build in a pool of that many
+    processes (None for one per CPU).
+
+    Only the single goal with the blank in the bottom right is handled.
+    Subclass with other patterns for a different partition, e.g. 7-8:
+        class PatternDatabase78(AdditivePatternDatabase):
+            patterns = {4: ((1, 2, 3, 4, 5, 6, 7),
+                            (8, 9, 10, 11, 12, 13, 14, 15))}
+    """
+
+    patterns = {
+        3: ((1, 2, 4, 5), (3, 6, 7, 8)),
+        4: ((1, 5, 6, 9, 10, 13), (7, 8, 11, 12, 14, 15), (2, 3, 4)),
+        5: ((1, 2, 6, 7, 11, 12), (3, 4, 5, 8, 9, 10),
+            (13, 14, 15, 18, 19, 20), (16, 17, 21, 22, 23, 24)),
+        }
+    processes = 1
+    directory = os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or
+        os.path.join(os.path.expanduser("~"), ".cache"), "npuzzle-pdb")
+
+    # (class, board size) -> list of loaded patterndb.PatternDatabase
+    _databases = {}
+
+    @classmethod
+    def filename(cls, boardsize, tiles):
+        "filename(boardsize, tiles) - database file of a pattern"
+        return os.path.join(cls.directory, "{}-{}.pdb".format(
+            boardsize * boardsize, "-".join(str(tile) for tile in tiles)))
+
+    @classmethod
+    def build(cls, boardsize, rebuild=False):
+        """build(boardsize, rebuild) - build and save the databases
+        Databases already in directory are kept unless rebuild is True."""
+        cls._databases.pop((cls, boardsize), None)
+        os.makedirs(cls.directory, exist_ok=True)
+        for tiles in cls.patterns[boardsize]:
+            filename = cls.filename(boardsize, tiles)
+            if rebuild or not os.path.exists(filename):
+                if cls.processes == 1:
+                    table = patterndb.build(boardsize, tiles)
+                else:
+                    table = patterndb.build_parallel(boardsize, tiles,
+                                                     cls.processes)
+                patterndb.write(filename, boardsize, tiles, table)
+
+    @classmethod
+    def databases(cls, boardsize):
+        "databases(boardsize) - loaded databases, see build"
+        try:
+            return cls._databases[(cls, boardsize)]
+        except KeyError:
+            pass
+        databases = []
+        for tiles in cls.patterns[boardsize]:
+            filename = cls.filename(boardsize, tiles)
+            if not os.path.exists(filename):
+                raise FileNotFoundError(
+                    "No pattern database {}, call {}.build({}) first".format(
+                        filename, cls.__name__, boardsize))
+            databases.append(patterndb.PatternDatabase(filename))
+        cls._databases[(cls, boardsize)] = databases
+        return databases
+
+    @classmethod
+    def h(cls, state):
+        tiles = state.state_tuple()
+        position = [0] * len(tiles)  # position[tile] is its cell
+        for cell, tile in enumerate(tiles):
+            position[tile or 0] = cell
+        return sum(database.value(position)
+                   for database in cls.databases(state.boardsize))
+
+class _Cached(tuple):
+    """(zhash, parts, previous) - heuristic parts of a board
+    previous is the entry of the board it was changed from, or None.
+    Entries are immutable, so board copies (even deep ones) share them."""
+
+    __slots__ = ()
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class IncrementalHeuristic(Manhattan):
+    """IncrementalHeuristic - base for heuristics updated move by move
+    Subclasses provide classmethods compute(state) and update(parts,
+    boardsize, tile, source, target).  Both return a tuple of parts
+    whose first entry is the heuristic value.  update gets the parts
+    of the board before tile slid from cell source to cell target.
+
+    The parts are kept on the board with its Zobrist hash and a link
+    to the entry of the board it was changed from.  New boards are
+    copies of their parent (TileBoard.move), which carry the parent's
+    entry, or the parent changed in place (TileBoard.slide, as idastar
+    does).  In place the board still carries the entry of the last
+    board below the parent that h was asked about, so h follows the
+    links back to the board before board.lastmove and calls update
+    from its parts: every sibling is updated from the parent, not just
+    the first.  Only when no linked board matches does h call compute.
+    """
+
+    @classmethod
+    def h(cls, state):
+        name = "_" + cls.__name__
+        entry = getattr(state, name, None)
+        if entry is not None and entry[0] == state.zhash:
+            return entry[1][0]
+        before = None
+        if state.lastmove is not None:
+            (tile, source, target) = state.lastmove
+            keys = state.zobrist[tile]
+            before = state.zhash ^ keys[source] ^ keys[target]
+        # Back up over boards explored below the one before the move
+        while entry is not None and entry[0] != before and \
+                entry[0] != state.zhash:
+            entry = entry[2]
+        if entry is None:
+            entry = _Cached((state.zhash, cls.compute(state), None))
+        elif entry[0] == before:
+            entry = _Cached((state.zhash,
+                             cls.update(entry[1], state.boardsize,
+                                        tile, source, target), entry))
+        setattr(state, name, entry)
+        return entry[1][0]
+
+
+def _lis(values):
+    "_lis(values) - length of the longest increasing subsequence"
+    tails = []  # tails[i] is the smallest end of a length i+1 run
+    for value in values:
+        lo, hi = 0, len(tails)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if tails[mid] < value:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(tails):
+            tails.append(value)
+        else:
+            tails[lo] = value
+    return len(tails)
+
+
+class LinearConflict(IncrementalHeuristic):
+    """LinearConflict - Manhattan distance plus linear conflicts
+    Tiles in their goal row that are out of order relative to each
+    other cannot pass: all but a longest increasing run of them must
+    step out of the row and back, two extra moves each.  The same holds
+    for columns.  Only the single goal with the blank in the bottom
+    right is handled.
+
+    Each line (row or column) is coded as an integer with one base
+    size+1 digit per cell: the goal position within the line of a tile
+    whose goal is on this line, size otherwise.  The extra moves of
+    every line code are precomputed, and a move only changes the codes
+    of the lines it touches.  parts are (value, manhattan, row codes,
+    column codes).
+    """
+
+    # board size -> (distance, row terms, column terms, conflicts)
+    _tables = {}
+
+    @classmethod
+    def tables(cls, boardsize):
+        """tables(boardsize) - precomputed tables for a board size
+        distance[tile][cell] - Manhattan distance of tile in cell
+        rowterm[tile][cell] - the tile's contribution to its row code,
+            tile 0 is the blank
+        colterm[tile][cell] - the same for the column code
+        conflicts[code] - extra moves for a line code"""
+        try:
+            return cls._tables[boardsize]
+        except KeyError:
+            pass
+        cells = boardsize * boardsize
+        base = boardsize + 1
+        distance = [[0] * cells for _ in range(cells)]
+        rowterm = [[0] * cells for _ in range(cells)]
+        colterm = [[0] * cells for _ in range(cells)]
+        for tile in range(cells):
+            (goal_r, goal_c) = divmod((tile or cells) - 1, boardsize)
+            for cell in range(cells):
+                (r, c) = divmod(cell, boardsize)
+                if tile:
+                    distance[tile][cell] = abs(goal_r - r) + abs(goal_c - c)
+                rowdigit = goal_c if tile and goal_r == r else boardsize
+                coldigit = goal_r if tile and goal_c == c else boardsize
+                rowterm[tile][cell] = rowdigit * base ** c
+                colterm[tile][cell] = coldigit * base ** r
+        conflicts = []
+        for code in range(base ** boardsize):
+            digits = []
+            for _ in range(boardsize):
+                (code, digit) = divmod(code, base)
+                if digit != boardsize:
+                    digits.append(digit)
+            conflicts.append(2 * (len(digits) - _lis(digits)))
+        entry = (distance, rowterm, colterm, conflicts)
+        cls._tables[boardsize] = entry
+        return entry
+
+    @classmethod
+    def compute(cls, state):
+        "compute(state) - parts of state from scratch"
+        size = state.boardsize
+        (distance, rowterm, colterm, conflicts) = cls.tables(size)
+        manhattan = 0
+        rows = [0] * size
+        cols = [0] * size
+        for cell, tile in enumerate(state.state_tuple()):
+            tile = tile or 0
+            (r, c) = divmod(cell, size)
+            manhattan += distance[tile][cell]
+            rows[r] += rowterm[tile][cell]
+            cols[c] += colterm[tile][cell]
+        value = manhattan + sum(conflicts[code] for code in rows) + \
+            sum(conflicts[code] for code in cols)
+        return (value, manhattan, tuple(rows), tuple(cols))
+
+    @classmethod
+    def update(cls, parts, boardsize, tile, source, target):
+        "update(parts, boardsize, tile, source, target) - parts after a move"
+        (distance, rowterm, colterm, conflicts) = cls.tables(boardsize)
+        (value, manhattan, rows, cols) = parts
+        extra = value - manhattan
+        manhattan += distance[tile][target] - distance[tile][source]
+        (source_r, source_c) = divmod(source, boardsize)
+        (target_r, target_c) = divmod(target, boardsize)
+
+        # The tile leaves source (now the blank) and enters target
+        rows = list(rows)
+        lines = {source_r, target_r}
+        extra -= sum(conflicts[rows[r]] for r in lines)
+        rows[source_r] += rowterm[0][source] - rowterm[tile][source]
+        rows[target_r] += rowterm[tile][target] - rowterm[0][target]
+        extra += sum(conflicts[rows[r]] for r in lines)
+
+        cols = list(cols)
+        lines = {source_c, target_c}
+        extra -= sum(conflicts[cols[c]] for c in lines)
+        cols[source_c] += colterm[0][source] - colterm[tile][source]
+        cols[target_c] += colterm[tile][target] - colterm[0][target]
+        extra += sum(conflicts[cols[c]] for c in lines)
+
+        return (manhattan + extra, manhattan, tuple(rows), tuple(cols))
+
+
+class WalkingDistance(IncrementalHeuristic):
+    """WalkingDistance - vertical plus horizontal walking distance
+    For rows, count how many tiles of each goal row are in each row.
+    A vertical move carries one tile to the blank's row, and the fewest
+    such moves from the counts to the goal counts is the vertical
+    walking distance.  It ignores where tiles are within their row.
+    Columns are counted the same way for horizontal moves, and the two
+    are added.  Only the single goal with the blank in the bottom right
+    is handled.
+
+    Counts and the blank's row are coded as an integer, one base size+1
+    digit per (row, goal row) pair and the blank's row above them.
+    table maps each code to its distance, found by breadth first search
+    from the goal.  Columns use the same table, since swapping rows and
+    columns maps the goal onto itself.  A move changes one count in one
+    code by one.  parts are (value, row code, column code).
+
+    The table is small up to the 15 puzzle (24,964 codes) but the 24
+    puzzle's would take hundreds of millions of entries, so boards
+    larger than 4x4 are rejected.
+    """
+
+    # board size -> (table, weights)
+    _tables = {}
+    maxsize = 4  # largest board size with a table
+
+    @classmethod
+    def tables(cls, boardsize):
+        """tables(boardsize) - walking distance table for a board size
+        Returns (table, weights): weights[row*size + goal row] is the code
+        of one tile, weights[size*size] that of the blank's row."""
+        try:
+            return cls._tables[boardsize]
+        except KeyError:
+            pass
+        if boardsize > cls.maxsize:
+            raise ValueError(
+                "WalkingDistance handles boards up to {0}x{0}, not {1}x{1}"
+                .format(cls.maxsize, boardsize))
+        size = boardsize
+        base = size + 1
+        weights = [base ** idx for idx in range(size*size + 1)]
+
+        def code(counts, blank):
+            return sum(count * weight for count, weight in
+                       zip(counts, weights)) + blank * weights[size*size]
+
+        goal = [0] * (size*size)
+        for row in range(size):
+            goal[row*size + row] = size
+        goal[-1] = size - 1  # the blank's row
+        table = {code(goal, size-1): 0}
+        layer = [(tuple(goal), size-1)]
+        depth = 0
+        while layer:
+            depth += 1
+            nextlayer = []
+            for (counts, blank) in layer:
+                for row in (blank - 1, blank + 1):
+                    if not 0 <= row < size:
+                        continue
+                    # Carry a tile of any goal row from row to blank
+                    for goalrow in range(size):
+                        if counts[row*size + goalrow]:
+                            child = list(counts)
+                            child[row*size + goalrow] -= 1
+                            child[blank*size + goalrow] += 1
+                            key = code(child, row)
+                            if key not in table:
+                                table[key] = depth
+                                nextlayer.append((tuple(child), row))
+            layer = nextlayer
+        entry = (table, weights)
+        cls._tables[boardsize] = entry
+        return entry
+
+    @classmethod
+    def compute(cls, state):
+        "compute(state) - parts of state from scratch"
+        size = state.boardsize
+        (table, weights) = cls.tables(size)
+        rows = cols = 0
+        for cell, tile in enumerate(state.state_tuple()):
+            (r, c) = divmod(cell, size)
+            if tile:
+                (goal_r, goal_c) = divmod(tile - 1, size)
+                rows += weights[r*size + goal_r]
+                cols += weights[c*size + goal_c]
+            else:
+                rows += r * weights[size*size]
+                cols += c * weights[size*size]
+        return (table[rows] + table[cols], rows, cols)
+
+    @classmethod
+    def update(cls, parts, boardsize, tile, source, target):
+        "update(parts, boardsize, tile, source, target) - parts after a move"
+        size = boardsize
+        (table, weights) = cls.tables(size)
+        (value, rows, cols) = parts
+        (source_r, source_c) = divmod(source, size)
+        (target_r, target_c) = divmod(target, size)
+        (goal_r, goal_c) = divmod(tile - 1, size)
+        # The blank moves from target to source
+        if source_r != target_r:
+            rows += weights[target_r*size + goal_r] - \
+                weights[source_r*size + goal_r] + \
+                (source_r - target_r) * weights[size*size]
+        else:
+            cols += weights[target_c*size + goal_c] - \
+                weights[source_c*size + goal_c] + \
+                (source_c - target_c) * weights[size*size]
+        return (table[rows] + table[cols], rows, cols)